@@ -0,0 +1,81 @@
+"""Benchmarks rendering show times through the `datetime` Jinja filter.
+
+Compares the original path (strftime in the route, dateutil parse and
+babel pattern parsing per row) with the current one (native datetimes,
+precompiled patterns, memoized results). Needs no database:
+
+    python -m benchmarks.datetime_filter --rows 20000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from fyyur import app, format_datetime, _format_datetime
+
+TEMPLATE = "{% for show in shows %}<h4>{{ show.start_time|datetime('full') }}</h4>{% endfor %}"
+
+
+def original_format_datetime(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale="en")
+
+
+def start_times(rows, distinct):
+    rng = random.Random(0)
+    first = datetime(2026, 1, 1)
+    if distinct:
+        return [first + timedelta(minutes=i) for i in range(rows)]
+    # shows start on the hour in the evening, so times repeat across rows
+    return [first + timedelta(days=rng.randrange(365), hours=rng.choice((19, 20, 21)))
+            for _ in range(rows)]
+
+
+def rows_per_second(env, shows, repeat):
+    template = env.from_string(TEMPLATE)
+    best = float("inf")
+    for _ in range(repeat):
+        _format_datetime.cache_clear()
+        start = time.perf_counter()
+        template.render(shows=shows)
+        best = min(best, time.perf_counter() - start)
+    return round(len(shows) / best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original = app.jinja_env.overlay()
+    # an overlay shares the filters dict with the app's environment
+    original.filters = dict(app.jinja_env.filters, datetime=original_format_datetime)
+    report = {"rows": args.rows}
+    for case, distinct in (("repeated_times", False), ("distinct_times", True)):
+        times = start_times(args.rows, distinct)
+        assert all(original_format_datetime(str(t), "full") == format_datetime(t, "full")
+                   for t in times[:100])
+        report[case] = {
+            "original_rows_per_sec": rows_per_second(
+                original,
+                [{"start_time": t.strftime("%Y-%m-%d %H:%M:%S")} for t in times],
+                args.repeat,
+            ),
+            "current_rows_per_sec": rows_per_second(
+                app.jinja_env, [{"start_time": t} for t in times], args.repeat
+            ),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
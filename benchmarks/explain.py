@@ -0,0 +1,148 @@
+"""Prints the EXPLAIN plan of every route's query.
+
+Run it before and after `flask db upgrade` to compare access paths:
+
+    python -m benchmarks.explain [--analyze]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from fyyur import app, db, search
+from fyyur.dedup import insert_new_statement
+from fyyur.models import Venue, Artist, Show
+from fyyur.pagination import keyset_query, encode_cursor
+from fyyur.scheduling import DEFAULT_SHOW_DURATION, occurrences
+from fyyur.queries import (
+    shows_listing,
+    show_conflicts,
+    venue_calendar,
+    series_conflicts,
+    venue_shows,
+    artist_shows,
+    venues_listing,
+    artists_listing,
+    SHOWS_ORDER,
+    VENUES_ORDER,
+    ARTISTS_ORDER,
+    UPCOMING_SHOWS_LIMIT,
+    PAST_SHOWS_PAGE_SIZE,
+)
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, analyze=False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN (ANALYZE, BUFFERS) " if element.analyze else "EXPLAIN "
+    if not element.statement.is_dml:
+        return prefix + compiler.process(element.statement, **kw)
+    # nested, so an INSERT's RETURNING does not become the result: the plan is
+    compiler.stack.append(
+        {"correlate_froms": set(), "asfrom_froms": set(), "selectable": element}
+    )
+    try:
+        return prefix + compiler.process(element.statement, **kw)
+    finally:
+        compiler.stack.pop()
+
+
+def middle_cursor(query, keys):
+    """Cursor pointing halfway through `query`, to plan a deep page."""
+    total = query.count()
+    row = query.order_by(*keys).offset(total // 2).first()
+    return encode_cursor([getattr(row, key.key) for key in keys]) if row else None
+
+
+def stored_values(model):
+    """The columns of a stored row but its id, as a create handler would
+    insert them again, or None for an empty table."""
+    row = db.session.query(*model.__table__.c).first()
+    return {key: value for key, value in row._asdict().items() if key != "id"} if row else None
+
+
+def route_queries():
+    venue = db.session.query(Venue.id).first()
+    artist = db.session.query(Artist.id).first()
+    now = datetime.now()
+    venue_id = venue.id if venue else 0
+    artist_id = artist.id if artist else 0
+
+    shows = shows_listing()
+    yield "GET /shows", keyset_query(shows, SHOWS_ORDER)
+    yield "GET /shows (deep page)", keyset_query(
+        shows, SHOWS_ORDER, middle_cursor(shows, SHOWS_ORDER))
+    yield "GET /shows?venue_id=", keyset_query(
+        shows_listing(venue_id=venue_id), SHOWS_ORDER)
+    yield "GET /shows?artist_id=", keyset_query(
+        shows_listing(artist_id=artist_id), SHOWS_ORDER)
+    yield "GET /shows?from=&to=", keyset_query(
+        shows_listing(start=now, end=now + timedelta(days=7)), SHOWS_ORDER)
+    yield "GET /venues/<id>/availability", venue_calendar(
+        venue_id, now, now + timedelta(days=7))
+
+    venues = venues_listing()
+    yield "GET /venues", keyset_query(venues, VENUES_ORDER)
+    yield "GET /venues (deep page)", keyset_query(
+        venues, VENUES_ORDER, middle_cursor(venues, VENUES_ORDER))
+    artists = artists_listing()
+    yield "GET /artists", keyset_query(artists, ARTISTS_ORDER)
+    yield "GET /artists (deep page)", keyset_query(
+        artists, ARTISTS_ORDER, middle_cursor(artists, ARTISTS_ORDER))
+
+    for route, shows in (("GET /venues/<id>", venue_shows(venue_id)),
+                         ("GET /artists/<id>", artist_shows(artist_id))):
+        yield f"{route} upcoming shows", keyset_query(
+            shows.filter(Show.start_time > now), SHOWS_ORDER,
+            per_page=UPCOMING_SHOWS_LIMIT)
+        yield f"{route} past shows", keyset_query(
+            shows.filter(Show.start_time <= now), SHOWS_ORDER,
+            per_page=PAST_SHOWS_PAGE_SIZE, descending=True)
+    for model in (Venue, Artist):
+        yield f"{model.__tablename__} by genre", model.query.filter(
+            model.genres.op("@>")(db.cast(["Jazz"], model.genres.type)))
+
+    for term in ("hop", "blue moon"):
+        yield f"POST /venues/search {term!r}", search._search_query(Venue, "venue", term)
+        yield f"POST /artists/search {term!r}", search._search_query(Artist, "artist", term)
+
+    # a stored row again, so the plans take the duplicate path
+    for model in (Venue, Artist, Show):
+        values = stored_values(model)
+        if values:
+            yield f"POST /{model.__tablename__}/create", insert_new_statement(model, values)
+    yield "POST /shows/create conflict check", show_conflicts(
+        venue_id, artist_id, now, now + DEFAULT_SHOW_DURATION)
+    yield "POST /series/create conflict check", series_conflicts(
+        venue_id, artist_id,
+        occurrences("FREQ=WEEKLY;COUNT=52", now, now + DEFAULT_SHOW_DURATION))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--analyze", action="store_true",
+                        help="run the queries (EXPLAIN ANALYZE) and show timings;"
+                             " the inserts are rolled back")
+    args = parser.parse_args()
+
+    with app.app_context():
+        for route, query in route_queries():
+            statement = getattr(query, "statement", query)
+            plan = db.session.execute(Explain(statement, args.analyze))
+            print(f"--- {route}")
+            for (line,) in plan:
+                print(line)
+            print()
+        db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Benchmarks every venue, artist and show route through the Flask test client.
+
+Seed a dataset first (`flask seed --scale N`), then:
+
+    python -m benchmarks.routes --requests 50 --output bench.json
+    python -m benchmarks.routes --compare bench.json
+
+Reports, per route, latency percentiles, SQL queries per request (the
+most any request ran, i.e. a page cache miss) and the peak memory allocated
+while serving one request, as JSON. Write routes
+create, edit and delete rows named "Benchmark ...", and the created ones
+stay behind, so run it against a scratch database.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, timedelta
+from itertools import count
+
+from sqlalchemy import event
+
+from fyyur import app, db
+from fyyur.cache import pages
+from fyyur.models import Venue, Artist, Show
+
+_names = count()
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.queries = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.queries += 1
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))]
+
+
+def venue_form(name):
+    return {
+        "name": name, "city": "San Francisco", "state": "CA",
+        "address": "1 Benchmark St", "phone": "415-000-0000", "genres": ["Jazz"],
+    }
+
+
+def artist_form(name):
+    return {
+        "name": name, "city": "San Francisco", "state": "CA",
+        "phone": "415-000-0000", "genres": ["Jazz"],
+    }
+
+
+def created_id(model, name):
+    return db.session.query(model.id).filter(model.name == name).scalar()
+
+
+def scenarios():
+    """Yields (route, request function) pairs covering routes/{venue,artist,show}.py."""
+    hot_venue = (db.session.query(Show.venue_id).group_by(Show.venue_id)
+                 .order_by(db.func.count().desc()).limit(1).scalar())
+    hot_artist = (db.session.query(Show.artist_id).group_by(Show.artist_id)
+                  .order_by(db.func.count().desc()).limit(1).scalar())
+    any_venue = db.session.query(db.func.max(Venue.id)).scalar()
+    any_artist = db.session.query(db.func.max(Artist.id)).scalar()
+    db.session.remove()
+
+    yield "GET /venues", lambda c: c.get("/venues")
+    yield "POST /venues/search", lambda c: c.post("/venues/search", data={"search_term": "blue"})
+    yield "GET /venues/<hot id>", lambda c: c.get(f"/venues/{hot_venue}")
+    yield "GET /venues/<id>", lambda c: c.get(f"/venues/{any_venue}")
+    yield "GET /venues/create", lambda c: c.get("/venues/create")
+    yield "GET /venues/<id>/edit", lambda c: c.get(f"/venues/{any_venue}/edit")
+
+    yield "GET /artists", lambda c: c.get("/artists")
+    yield "POST /artists/search", lambda c: c.post("/artists/search", data={"search_term": "blue"})
+    yield "GET /artists/<hot id>", lambda c: c.get(f"/artists/{hot_artist}")
+    yield "GET /artists/<id>", lambda c: c.get(f"/artists/{any_artist}")
+    yield "GET /artists/create", lambda c: c.get("/artists/create")
+    yield "GET /artists/<id>/edit", lambda c: c.get(f"/artists/{any_artist}/edit")
+
+    yield "GET /shows", lambda c: c.get("/shows")
+    yield "GET /shows?venue_id=<hot id>", lambda c: c.get(f"/shows?venue_id={hot_venue}")
+    yield "GET /shows/create", lambda c: c.get("/shows/create")
+
+    # write routes: each request works on a row of its own
+    def create(path, form, model):
+        def run(c):
+            name = f"Benchmark {model.__name__} {next(_names)}"
+            return c.post(path, data=form(name))
+        return run
+
+    def on_created(model, path, form, action):
+        # setup (create + lookup) is outside the timed request
+        def setup(c):
+            name = f"Benchmark {model.__name__} {next(_names)}"
+            c.post(path, data=form(name))
+            return name, created_id(model, name)
+
+        def run(c, state):
+            name, entity_id = state
+            if action == "edit":
+                return c.post(f"{path.rsplit('/', 1)[0]}/{entity_id}/edit",
+                              data=form(name + " (edited)"))
+            return c.delete(f"{path.rsplit('/', 1)[0]}/{entity_id}")
+        return setup, run
+
+    yield "POST /venues/create", create("/venues/create", venue_form, Venue)
+    yield "POST /venues/<id>/edit", on_created(Venue, "/venues/create", venue_form, "edit")
+    yield "DELETE /venues/<id>", on_created(Venue, "/venues/create", venue_form, "delete")
+    yield "POST /artists/create", create("/artists/create", artist_form, Artist)
+    yield "POST /artists/<id>/edit", on_created(Artist, "/artists/create", artist_form, "edit")
+    yield "DELETE /artists/<id>", on_created(Artist, "/artists/create", artist_form, "delete")
+    yield "POST /shows/create", lambda c: c.post("/shows/create", data={
+        "artist_id": str(any_artist), "venue_id": str(any_venue),
+        # a day each, as the venue and artist cannot be booked twice at once
+        "start_time": f"{date(2099, 1, 1) + timedelta(days=next(_names))} 20:00:00",
+    })
+
+
+def measure(client, counter, scenario, requests):
+    if isinstance(scenario, tuple):
+        setup, run = scenario
+    else:
+        setup, run = None, (lambda c, state: scenario(c))
+
+    latencies, queries, statuses = [], [], set()
+    for _ in range(requests):
+        state = setup(client) if setup else None
+        counter.queries = 0
+        start = time.perf_counter()
+        response = run(client, state)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(counter.queries)
+        statuses.add(response.status_code)
+
+    state = setup(client) if setup else None
+    tracemalloc.start()
+    run(client, state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p90_ms": round(percentile(latencies, 0.90), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "queries": max(queries),
+        "peak_kib": round(peak / 1024, 1),
+        "statuses": sorted(statuses),
+    }
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report):
+    for route, result in report["routes"].items():
+        before = baseline["routes"].get(route)
+        if before:
+            print(f"{route:34} p50 {before['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f} ms"
+                  f"   queries {before['queries']:>5} -> {result['queries']:>5}"
+                  f"   peak {before['peak_kib']:>9.1f} -> {result['peak_kib']:>9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="requests per route")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="print the change against an earlier report")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="render every request instead of serving cached pages")
+    args = parser.parse_args()
+
+    if args.no_page_cache:
+        pages.max_bytes = 0
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    client = app.test_client()
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        report = {"revision": revision(), "requests": args.requests, "routes": {}}
+        for route, scenario in scenarios():
+            report["routes"][route] = measure(client, counter, scenario, args.requests)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
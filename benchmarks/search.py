@@ -0,0 +1,98 @@
+"""Benchmarks ranked search against the original ILIKE scan.
+
+Loads synthetic venues into the configured database inside a transaction
+that is rolled back at the end, so nothing is left behind:
+
+    python -m benchmarks.search --rows 1000000
+"""
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import text
+
+from fyyur import app, db, search
+from fyyur.enums import Genre, State
+from fyyur.models import Venue
+
+WORDS = [
+    "Blue", "Moon", "Hall", "Club", "Jazz", "Cellar", "Garden", "Room",
+    "Social", "Lounge", "Musical", "Hop", "Park", "Theatre", "Dueling", "Pianos",
+]
+CITIES = ["San Francisco", "New York", "Chicago", "Austin", "Seattle", "Boston"]
+# selective terms, and broad ones matching most rows
+TERMS = ["jazz", "blue moon", "hop", "san francisco", "club 4242", "zzz", "club", "san", "hall room"]
+
+LOAD = text(
+    """
+    INSERT INTO venues (name, city, state, address, phone, genres)
+    SELECT w.words[1 + g % 16] || ' ' || w.words[1 + (g / 16) % 16] || ' ' || g,
+           w.cities[1 + g % 6],
+           w.states[1 + g % array_length(w.states, 1)],
+           g || ' Main St',
+           '555-000-0000',
+           ARRAY[w.genres[1 + g % array_length(w.genres, 1)]]
+    FROM generate_series(1, :rows) g,
+         (SELECT CAST(:words AS text[]) AS words, CAST(:cities AS text[]) AS cities,
+                 CAST(:states AS text[]) AS states, CAST(:genres AS text[]) AS genres) w
+    """
+)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 2),
+    }
+
+
+def ilike_path(term):
+    # what search_venues() did before: an unbounded, unranked substring scan
+    return Venue.query.filter(Venue.name.ilike(f"%{term}%")).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {"rows": args.rows, "terms": {}}
+    with app.app_context():
+        try:
+            db.session.execute(
+                LOAD,
+                {
+                    "rows": args.rows,
+                    "words": WORDS,
+                    "cities": CITIES,
+                    "states": [state.name for state in State],
+                    "genres": [genre.name for genre in Genre],
+                },
+            )
+            db.session.execute(text("ANALYZE venues"))
+            for term in TERMS:
+                report["terms"][term] = {
+                    "matches": len(ilike_path(term)),
+                    "ilike": timed(lambda: ilike_path(term), args.repeat),
+                    "search": timed(lambda: search.search_venues(term), args.repeat),
+                    "last_page": timed(
+                        lambda: search.search_venues(term, page=search.MAX_SEARCH_PAGES),
+                        args.repeat,
+                    ),
+                }
+                db.session.expunge_all()
+        finally:
+            db.session.rollback()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
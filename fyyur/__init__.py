@@ -3,15 +3,17 @@
 # ----------------------------------------------------------------------------#
 
 import dateutil.parser
-import babel
+from babel import Locale
+from babel.dates import parse_pattern
+from functools import lru_cache
 from flask import Flask
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 # from flask_wtf import Form
 # from forms import *
 from flask_migrate import Migrate
+from fyyur.replicas import RoutingSQLAlchemy
 
 # ----------------------------------------------------------------------------#
 #                                App Config.
@@ -20,20 +22,40 @@ from flask_migrate import Migrate
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object("config")
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
 
 # ----------------------------------------------------------------------------#
 #                                 Filters.
 # ----------------------------------------------------------------------------#
 
+DATETIME_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+LOCALE = Locale.parse("en")
+
+
+@lru_cache(maxsize=None)
+def _datetime_pattern(format):
+    # parsing a babel pattern costs more than applying it, so do it once
+    return parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format):
+    return _datetime_pattern(format).apply(value, LOCALE)
+
+
 def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale="en")
+    """Formats a datetime (or a string holding one) with a named or babel pattern.
+
+    Show times repeat a lot across a page (shows start on the hour), so the
+    formatted strings are memoized in a bounded cache.
+    """
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format)
 
 
 app.jinja_env.filters["datetime"] = format_datetime
@@ -46,6 +68,25 @@ from fyyur.routes.general import *
 from fyyur.routes.venue import *
 from fyyur.routes.artist import *
 from fyyur.routes.show import *
+from fyyur.routes.series import *
+from fyyur.routes.api import api
+import fyyur.export
+import fyyur.feeds
+import fyyur.importer
+
+app.register_blueprint(api)
+
+# ----------------------------------------------------------------------------#
+#                              Instrumentation.
+# ----------------------------------------------------------------------------#
+
+import fyyur.metrics
+
+# ----------------------------------------------------------------------------#
+#                                 Commands.
+# ----------------------------------------------------------------------------#
+
+import fyyur.cli
 
 # ----------------------------------------------------------------------------#
 #                                 Filters.
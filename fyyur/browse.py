@@ -0,0 +1,160 @@
+from flask import abort, request, url_for
+from sqlalchemy.dialects.postgresql import ARRAY
+from fyyur import db
+from fyyur.enums import Genre, State
+from fyyur.models import Venue, Artist
+
+# ----------------------------------------------------------------------------#
+#                              Faceted browsing.
+# ----------------------------------------------------------------------------#
+# Venues and artists narrowed by genre, state, city and seeking flag, with
+# the number of matches for each value of every dimension. Selected genres
+# must all be present (`genres @> ARRAY[...]`, served by the GIN indexes on
+# `genres`); state and city are served by the btree indexes on
+# (state, city). The facet counts of all dimensions, and the total, come
+# from one GROUPING SETS query over the matches, whatever the number of
+# dimensions.
+
+FACETS = ("genre", "state", "city", "seeking")
+# values listed per facet, most frequent first
+FACET_LIMIT = 20
+
+# grouping() of the FACETS columns, one bit each, set for those left out
+GROUPING_SETS = {0b0111: "genre", 0b1011: "state", 0b1101: "city", 0b1110: "seeking"}
+
+SEEKING = {Venue: Venue.seeking_talent, Artist: Artist.seeking_venue}
+
+
+def _genre(value):
+    # accepts the stored name ("Hip_Hop") or its label ("Hip-Hop")
+    try:
+        return Genre[value].name
+    except KeyError:
+        return Genre(value).name
+
+
+def parse_filters(args):
+    """The filters of `args`: {"genre": [names], "state", "city", "seeking"},
+    only those given. Aborts with 400 on unknown values."""
+    filters = {}
+    try:
+        genres = [_genre(value) for value in args.getlist("genre") if value]
+    except ValueError as error:
+        abort(400, description=str(error))
+    if genres:
+        filters["genre"] = sorted(set(genres))
+    state = args.get("state")
+    if state:
+        if state not in State.__members__:
+            abort(400, description=f"'{state}' is not a valid State")
+        filters["state"] = state
+    if args.get("city"):
+        filters["city"] = args["city"]
+    seeking = args.get("seeking")
+    if seeking:
+        if seeking not in ("true", "false"):
+            abort(400, description="'seeking' must be true or false")
+        filters["seeking"] = seeking == "true"
+    return filters
+
+
+def filtered(model, query, filters):
+    """Narrows `query` over `model` to the rows matching `filters`."""
+    if "genre" in filters:
+        genres = db.cast(filters["genre"], ARRAY(db.String(120)))
+        query = query.filter(model.genres.op("@>")(genres))
+    if "state" in filters:
+        query = query.filter(model.state == filters["state"])
+    if "city" in filters:
+        query = query.filter(model.city == filters["city"])
+    if "seeking" in filters:
+        seeking = SEEKING[model]
+        query = query.filter(seeking if filters["seeking"] else db.not_(seeking.is_(True)))
+    return query
+
+
+def browse_listing(model):
+    """Projects the columns of the browse results."""
+    return db.session.query(model.id, model.name, model.city, model.state, model.genres)
+
+
+def facet_counts(model, filters):
+    """Returns (total, facets) for the rows matching `filters`.
+
+    `facets` maps each of FACETS to [{"value", "label", "count"}], most
+    frequent first, at most FACET_LIMIT each. Genres are unnested with
+    their position, and the other dimensions count only the first genre's
+    row of each venue or artist, so one pass serves every grouping set.
+    """
+    genres = (
+        db.func.unnest(model.genres)
+        .table_valued("genre", with_ordinality="position")
+        .render_derived()
+        .lateral()
+    )
+    seeking = db.func.coalesce(SEEKING[model], False)
+    one_per_row = db.or_(genres.c.position.is_(None), genres.c.position == 1)
+    dimensions = (genres.c.genre, model.state, model.city, seeking)
+    query = filtered(
+        model,
+        db.session.query(
+            db.func.grouping(*dimensions).label("grouping"),
+            *dimensions,
+            db.case(
+                (db.func.grouping(genres.c.genre) == 0, db.func.count()),
+                else_=db.func.count().filter(one_per_row),
+            ).label("count"),
+        )
+        .select_from(model)
+        .outerjoin(genres, db.true()),
+        filters,
+    ).group_by(db.func.grouping_sets(*dimensions, db.text("()")))
+
+    total = 0
+    facets = {name: [] for name in FACETS}
+    for row in query:
+        name = GROUPING_SETS.get(row.grouping)
+        if name is None:
+            total = row.count
+            continue
+        value = row[FACETS.index(name) + 1]
+        if value is None:
+            # venues or artists without genres
+            continue
+        label = value
+        if name == "genre":
+            label = Genre[value].value if value in Genre.__members__ else value
+        elif name == "seeking":
+            label = "Yes" if value else "No"
+        facets[name].append({"value": value, "label": label, "count": row.count})
+    for values in facets.values():
+        values.sort(key=lambda facet: (-facet["count"], str(facet["label"])))
+        del values[FACET_LIMIT:]
+    return total, facets
+
+
+def _args(filters):
+    args = dict(filters)
+    if "seeking" in args:
+        args["seeking"] = "true" if args["seeking"] else "false"
+    return args
+
+
+def facet_links(facets, filters):
+    """Marks each facet value `selected` and gives it the `url` of the
+    current view with the value toggled, back on the first page."""
+    for name, values in facets.items():
+        for facet in values:
+            args = _args(filters)
+            if name == "genre":
+                selected = facet["value"] in filters.get("genre", ())
+                genres = set(filters.get("genre", ())) ^ {facet["value"]}
+                args["genre"] = sorted(genres)
+            else:
+                selected = filters.get(name) == facet["value"]
+                args.pop(name, None)
+                if not selected:
+                    args.update(_args({name: facet["value"]}))
+            facet["selected"] = selected
+            facet["url"] = url_for(request.endpoint, **{**args, **request.view_args})
+    return facets
@@ -0,0 +1,167 @@
+import os
+import select
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from fyyur import app, db
+
+# ----------------------------------------------------------------------------#
+#                            Invalidation bus.
+# ----------------------------------------------------------------------------#
+# Each worker process caches pages of its own (see fyyur.cache), so a write
+# handled by one worker has to reach the others. Writers publish the cache
+# tags they invalidated, e.g. ("show_venue", 3), and every worker evicts them.
+#
+# With INVALIDATION_BUS = "postgres", tags travel as NOTIFY payloads on the
+# INVALIDATION_CHANNEL channel and each worker runs a thread LISTENing on it.
+# A listener that loses its connection drops everything it was told to
+# evict, since it may have missed notifications. Listeners connect to
+# INVALIDATION_LISTEN_URI when set (e.g. to bypass PgBouncer), else to the
+# database. "local" delivers in-process only, for a single worker or when
+# there is no database to talk to.
+
+# NOTIFY payloads are limited to 8000 bytes
+PAYLOAD_BYTES = 7900
+RECONNECT_SECONDS = (1, 2, 5, 10, 30)
+
+
+def encode_tags(tags):
+    return [":".join(str(part) for part in tag) for tag in tags]
+
+
+def decode_tags(words):
+    tags = []
+    for word in words:
+        endpoint, *ids = word.split(":")
+        tags.append((endpoint, *map(int, ids)))
+    return tags
+
+
+class LocalBus:
+    """Delivers published tags to this process' subscribers only."""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, evict, reset):
+        """`evict(tags)` receives published tags; `reset()` is called when
+        notifications may have been missed."""
+        self._subscribers.append((evict, reset))
+
+    def publish(self, tags):
+        self._deliver(tags)
+
+    def start(self):
+        pass
+
+    def _deliver(self, tags):
+        for evict, _ in self._subscribers:
+            evict(tags)
+
+    def _reset(self):
+        for _, reset in self._subscribers:
+            reset()
+
+
+class PostgresBus(LocalBus):
+    """Delivers published tags locally at once, and to other workers by NOTIFY."""
+
+    def __init__(self, channel, listen_uri=None):
+        super().__init__()
+        self.channel = channel
+        self.listen_engine = create_engine(listen_uri, poolclass=NullPool) if listen_uri else None
+        self.origin = uuid.uuid4().hex
+        self._listener_pid = None
+        self._listening = False
+        self._lock = threading.Lock()
+
+    def publish(self, tags):
+        # this worker evicts before the response, so its user reads the write
+        self._deliver(tags)
+        try:
+            with db.engine.begin() as conn:
+                for payload in self._payloads(encode_tags(tags)):
+                    conn.execute(
+                        text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": self.channel, "payload": payload},
+                    )
+        except Exception:
+            # the write itself committed; other workers catch up by TTL
+            app.logger.exception("Could not publish cache invalidation %s", tags)
+
+    def _payloads(self, words):
+        chunk, size = [], len(self.origin)
+        for word in words:
+            if chunk and size + len(word) + 1 > PAYLOAD_BYTES:
+                yield " ".join([self.origin, *chunk])
+                chunk, size = [], len(self.origin)
+            chunk.append(word)
+            size += len(word) + 1
+        if chunk:
+            yield " ".join([self.origin, *chunk])
+
+    def start(self):
+        """Starts the listener thread, once per process (workers forked from
+        a preloaded app do not inherit the parent's thread)."""
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, name="fyyur-invalidation", daemon=True).start()
+
+    def _listen(self):
+        failures = 0
+        while True:
+            self._listening = False
+            try:
+                self._listen_once()
+            except Exception:
+                app.logger.exception("Cache invalidation listener lost its connection")
+            self._reset()
+            failures = 0 if self._listening else failures + 1
+            time.sleep(RECONNECT_SECONDS[min(failures, len(RECONNECT_SECONDS) - 1)])
+
+    def _listen_once(self):
+        # a connection of its own, outside the pool, for as long as it lives
+        connection = (self.listen_engine or db.engine).raw_connection()
+        connection.detach()
+        dbapi_connection = connection.connection
+        try:
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            self._listening = True
+            # pages cached before LISTEN took effect may have missed a write
+            self._reset()
+            while True:
+                if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self._receive(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _receive(self, payload):
+        origin, *words = payload.split(" ")
+        if origin != self.origin:
+            self._deliver(decode_tags(words))
+
+
+def create_bus(kind, channel, listen_uri=None):
+    if kind == "postgres":
+        return PostgresBus(channel, listen_uri)
+    if kind == "local":
+        return LocalBus()
+    raise ValueError(f"Unknown INVALIDATION_BUS {kind!r}")
+
+
+bus = create_bus(
+    app.config["INVALIDATION_BUS"],
+    app.config["INVALIDATION_CHANNEL"],
+    app.config["INVALIDATION_LISTEN_URI"],
+)
@@ -0,0 +1,280 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, make_response, request, session
+from werkzeug.http import is_resource_modified
+from fyyur.replicas import read_bind
+from fyyur import app, db
+from fyyur.models import Show
+from fyyur.bus import bus
+
+# ----------------------------------------------------------------------------#
+#                               Page cache.
+# ----------------------------------------------------------------------------#
+# Rendered listing and detail pages are kept per process, keyed by endpoint,
+# entity id and query string, and evicted least recently used once they
+# take more than PAGE_CACHE_MAX_BYTES, or after PAGE_CACHE_TTL seconds (shows
+# move from upcoming to past with time alone). Write handlers invalidate the
+# pages they change explicitly, through the functions at the bottom, which
+# publish on fyyur.bus so that every worker evicts them.
+#
+# Pages are only cached for requests without pending flash messages, since
+# the layout renders (and consumes) them. A page rendered from a read
+# replica may show data up to REPLICA_MAX_LAG_SECONDS old, so it is not
+# stored if its tag was invalidated within that window.
+#
+# Detail pages are also versioned by their row's updated_at, or the start
+# of their last show if later, so browsers and crawlers revalidate them
+# with a conditional GET answered by a 304 before the page cache is even
+# consulted (see versioned_page).
+
+
+class PageCache:
+    """An LRU cache of response bodies bounded by total size and entry age."""
+
+    # invalidation times are pruned once there are this many
+    PRUNE_AT = 4096
+
+    def __init__(self, max_bytes, ttl, replica_lag=0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.replica_lag = replica_lag
+        self.clock = clock
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        # bumped by every invalidation, so a page rendered from data read
+        # before a write is not stored after that write invalidated it
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (expires, size, body, mimetype)
+        self._tags = {}  # (endpoint, *view args) -> keys cached under it
+        # tag -> last invalidation (None: last clear), kept for replica_lag seconds
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    self._remove(key)
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def set(self, key, body, mimetype, generation, read_at=None):
+        """Stores a page rendered at `generation`; `read_at` is when its data
+        was current, if earlier than the render (read from a replica)."""
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if read_at is not None and any(
+                self._invalidated.get(tag, read_at) > read_at for tag in (key[0], None)
+            ):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self.clock() + self.ttl, size, body, mimetype)
+            self._tags.setdefault(key[0], set()).add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        """Drops every page cached under `tags`, whatever its query string."""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+            self._record(tags)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+            self._record([None])
+
+    def _record(self, tags):
+        if not self.replica_lag:
+            return
+        now = self.clock()
+        if len(self._invalidated) >= self.PRUNE_AT:
+            self._invalidated = {
+                tag: when
+                for tag, when in self._invalidated.items()
+                if when > now - self.replica_lag
+            }
+        self._invalidated.update((tag, now) for tag in tags)
+
+    def _remove(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self.size -= size
+        keys = self._tags[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._tags[key[0]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+pages = PageCache(
+    app.config["PAGE_CACHE_MAX_BYTES"],
+    app.config["PAGE_CACHE_TTL"],
+    app.config["REPLICA_MAX_LAG_SECONDS"] if app.config["SQLALCHEMY_REPLICA_URIS"] else 0,
+)
+bus.subscribe(pages.invalidate, pages.clear)
+
+
+def cached_page(view):
+    """Serves GET responses of `view` from `pages`, keyed by its view args."""
+
+    @wraps(view)
+    def wrapper(**view_args):
+        if not pages.max_bytes or "_flashes" in session:
+            return view(**view_args)
+        bus.start()
+        tag = (request.endpoint, *view_args.values())
+        key = (tag, request.query_string)
+        hit = pages.get(key)
+        if hit is not None:
+            body, mimetype = hit
+            return Response(body, mimetype=mimetype)
+        generation = pages.generation
+        read_at = pages.clock() - pages.replica_lag if read_bind() else None
+        response = make_response(view(**view_args))
+        if response.status_code == 200 and "_flashes" not in session:
+            pages.set(key, response.get_data(), response.mimetype, generation, read_at)
+        return response
+
+    return wrapper
+
+
+def versioned_page(version):
+    """Answers GET requests of a view with 304 when the client has its page.
+
+    `version(**view_args)` returns when the page's data last changed, an
+    aware datetime from one indexed lookup, or None when the page has no version (the view
+    then renders as usual). It is the page's Last-Modified and ETag; a
+    matching If-None-Match or If-Modified-Since skips the view entirely.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            # the layout renders (and consumes) pending flash messages
+            if "_flashes" in session:
+                return view(**view_args)
+            changed_at = version(**view_args)
+            if changed_at is None:
+                return view(**view_args)
+            etag = f"{request.endpoint}-{changed_at.timestamp()}"
+            if is_resource_modified(request.environ, etag, last_modified=changed_at):
+                response = make_response(view(**view_args))
+                if response.status_code != 200 or "_flashes" in session:
+                    return response
+            else:
+                response = Response(status=304)
+            response.set_etag(etag)
+            response.last_modified = changed_at
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# Shows list both their venue's and their artist's name and image, so
+# changing either side stales the detail pages of the other, and a venue's
+# availability calendar names the artists of its shows.
+
+
+def _partners(column, criterion):
+    return [partner_id for partner_id, in db.session.query(column).filter(criterion).distinct()]
+
+
+def venue_artists(venue_id):
+    """Ids of the artists whose pages list shows at the venue."""
+    return _partners(Show.artist_id, Show.venue_id == venue_id)
+
+
+def artist_venues(artist_id):
+    """Ids of the venues whose pages list shows by the artist."""
+    return _partners(Show.venue_id, Show.artist_id == artist_id)
+
+
+def invalidate(*tags):
+    bus.publish(tags)
+
+
+def venue_created():
+    invalidate(("venues",), ("browse_venues",))
+
+
+def venue_changed(venue_id, artist_ids=()):
+    """After a venue is edited or deleted; `artist_ids` are those listing its shows."""
+    venues_changed([venue_id], artist_ids)
+
+
+def venues_changed(venue_ids, artist_ids=()):
+    invalidate(
+        ("venues",),
+        ("browse_venues",),
+        ("shows",),
+        *(("show_venue", venue_id) for venue_id in venue_ids),
+        *(("venue_availability", venue_id) for venue_id in venue_ids),
+        *(("show_artist", artist_id) for artist_id in artist_ids),
+    )
+
+
+def artist_created():
+    invalidate(("artists",), ("browse_artists",))
+
+
+def artist_changed(artist_id, venue_ids=(), counts_changed=False):
+    """After an artist is edited or deleted; `venue_ids` are those listing its shows.
+
+    The venues listing shows upcoming show counts, pass `counts_changed`
+    when the artist's shows were removed.
+    """
+    artists_changed([artist_id], venue_ids, counts_changed)
+
+
+def artists_changed(artist_ids, venue_ids=(), counts_changed=False):
+    tags = [("artists",), ("browse_artists",), ("shows",)]
+    tags.extend(("show_artist", artist_id) for artist_id in artist_ids)
+    tags.extend(("show_venue", venue_id) for venue_id in venue_ids)
+    tags.extend(("venue_availability", venue_id) for venue_id in venue_ids)
+    if counts_changed:
+        tags.append(("venues",))
+    invalidate(*tags)
+
+
+def show_created(venue_id, artist_id):
+    shows_created([venue_id], [artist_id])
+
+
+def shows_created(venue_ids, artist_ids):
+    shows_changed(venue_ids, artist_ids)
+
+
+def shows_changed(venue_ids, artist_ids):
+    """After shows of these venues and artists are added, moved or removed."""
+    invalidate(
+        ("shows",),
+        ("venues",),
+        *(("show_venue", venue_id) for venue_id in venue_ids),
+        *(("venue_availability", venue_id) for venue_id in venue_ids),
+        *(("show_artist", artist_id) for artist_id in artist_ids),
+    )
@@ -0,0 +1,88 @@
+import json
+import click
+from flask.cli import AppGroup
+from fyyur import app, db
+from fyyur import counters, seed, export, importer
+
+# ----------------------------------------------------------------------------#
+#                               CLI Commands.
+# ----------------------------------------------------------------------------#
+
+counters_cli = AppGroup("counters", help="Maintain the venue/artist show counters.")
+
+
+@counters_cli.command("rollover")
+def counters_rollover():
+    """Moves shows that have started from upcoming to past. Run it from cron."""
+    moved = counters.roll_over()
+    db.session.commit()
+    click.echo(f"{moved} show(s) rolled over to past.")
+
+
+@counters_cli.command("verify")
+@click.option("--repair", is_flag=True, help="Rewrite the counters that drifted.")
+def counters_verify(repair):
+    """Reports (and optionally repairs) counters that disagree with the shows table."""
+    drift = counters.verify(repair=repair)
+    db.session.commit()
+    for table, rows in drift.items():
+        for row in rows:
+            click.echo(
+                f"{table} {row.id}: counted {row.upcoming_shows_count}/{row.past_shows_count},"
+                f" actual {row.upcoming}/{row.past} (upcoming/past)"
+            )
+        click.echo(f"{table}: {len(rows)} drifted row(s)" + (" repaired." if repair and rows else "."))
+
+
+app.cli.add_command(counters_cli)
+
+
+@app.cli.command("seed")
+@click.option("--scale", type=int, default=1, show_default=True,
+              help=f"Units of {seed.VENUES_PER_SCALE} venues, {seed.ARTISTS_PER_SCALE}"
+                   f" artists and {seed.SHOWS_PER_SCALE} shows.")
+@click.option("--skew", type=float, default=1.1, show_default=True,
+              help="Zipf exponent of show placement; 0 spreads shows evenly.")
+@click.option("--seed", "random_seed", type=int, default=None,
+              help="Random seed, for a reproducible dataset.")
+def seed_command(scale, skew, random_seed):
+    """Bulk-generates a synthetic dataset of venues, artists and shows."""
+    venues, artists, shows = seed.seed(scale, skew=skew, seed=random_seed)
+    click.echo(f"Created {venues} venues, {artists} artists and {shows} shows.")
+
+
+@app.cli.command("export")
+@click.argument("table", type=click.Choice(sorted(export.TABLES)))
+@click.option("--format", "format", type=click.Choice(sorted(export.FORMATS)),
+              default="ndjson", show_default=True)
+@click.option("--gzip", is_flag=True, help="Compress the output with gzip.")
+@click.option("--output", "-o", default="-", help="File to write, stdout by default.")
+def export_command(table, format, gzip, output):
+    """Streams a whole table as NDJSON or CSV."""
+    with click.open_file(output, "wb") as f:
+        for chunk in export.export(table, format, gzip=gzip):
+            f.write(chunk)
+
+
+@app.cli.command("import")
+@click.argument("table", type=click.Choice(sorted(importer.LOADERS)))
+@click.argument("source", type=click.File("r", encoding="utf-8-sig"))
+@click.option("--format", "format", type=click.Choice(importer.FORMATS),
+              help="Format of SOURCE, by default its extension.")
+@click.option("--report", type=click.File("w"), help="Write the full report here, as JSON.")
+def import_command(table, source, format, report):
+    """Bulk-loads venues, artists or shows from a CSV or NDJSON file ("-" for stdin)."""
+    format = format or source.name.rpartition(".")[2].lower()
+    if format not in importer.FORMATS:
+        raise click.BadParameter("use csv or ndjson", param_hint="--format")
+    result = importer.run_import(table, source, format)
+    for line, errors in result.errors:
+        for field, messages in errors.items():
+            click.echo(f"line {line}: {field + ': ' if field else ''}{'; '.join(messages)}", err=True)
+    if report:
+        json.dump(result.to_dict(), report, indent=2)
+    click.echo(
+        f"Imported {result.inserted} {table}; {len(result.duplicates)} duplicate(s),"
+        f" {len(result.conflicts)} double booking(s)"
+        f" and {len(result.errors)} invalid row(s) skipped."
+    )
@@ -0,0 +1,198 @@
+from fyyur import db
+from fyyur.models import Venue, Artist, Show
+from datetime import datetime
+from sqlalchemy import text
+
+# ----------------------------------------------------------------------------#
+#                               Show counters.
+# ----------------------------------------------------------------------------#
+# Venue/Artist carry upcoming_shows_count and past_shows_count so listings
+# never aggregate shows. Show.counted_upcoming records which bucket a show
+# is counted in; every function here runs inside the caller's transaction.
+#
+# Every statement updating the counters also stamps shows_changed_at, the
+# version of the venue's or artist's feed (see fyyur.feeds): its shows
+# change, or start, only along with their counters. clock_timestamp()
+# rather than now(), so that a writer waiting on the row lock stamps it
+# later than the one it waited for.
+
+# counted tables and the shows column referencing them
+COUNTED_TABLES = (("venues", "venue_id"), ("artists", "artist_id"))
+
+ADD_COUNTS = """
+    UPDATE {table} e
+    SET upcoming_shows_count = upcoming_shows_count + d.upcoming,
+        past_shows_count = past_shows_count + d.past,
+        shows_changed_at = clock_timestamp()
+    FROM unnest(CAST(:ids AS integer[]), CAST(:upcoming AS integer[]),
+                CAST(:past AS integer[])) AS d(id, upcoming, past)
+    WHERE e.id = d.id
+"""
+
+
+def counted_upcoming(start_time, now=None):
+    """The counted_upcoming flag to insert a show starting at `start_time` with."""
+    return start_time > (now or datetime.now())
+
+
+def shows_added(shows):
+    """Counts inserted shows for their venues and artists, in one UPDATE per table.
+
+    `shows` are rows with venue_id, artist_id and counted_upcoming, such
+    as those returned by the INSERT.
+    """
+    _count_shows(shows, 1)
+
+
+def shows_removed(shows):
+    """Uncounts deleted shows, rows like those of `shows_added` returned by
+    the DELETE (which waits for a concurrent roll-over, so their flags are
+    current)."""
+    _count_shows(shows, -1)
+
+
+def _count_shows(shows, sign):
+    for table, key in COUNTED_TABLES:
+        counts = {}
+        for show in shows:
+            upcoming, past = counts.get(getattr(show, key), (0, 0))
+            counts[getattr(show, key)] = (
+                (upcoming + sign, past) if show.counted_upcoming else (upcoming, past + sign)
+            )
+        if counts:
+            db.session.execute(
+                text(ADD_COUNTS.format(table=table)),
+                {
+                    "ids": list(counts),
+                    "upcoming": [upcoming for upcoming, _ in counts.values()],
+                    "past": [past for _, past in counts.values()],
+                },
+            )
+
+
+def _release_shows(model, key, criterion):
+    # FOR UPDATE makes a concurrent roll-over finish first, so the flags we
+    # aggregate are the ones the shows are really counted with.
+    shows = (
+        db.session.query(key.label("id"), Show.counted_upcoming)
+        .filter(criterion)
+        .with_for_update()
+        .subquery()
+    )
+    counts = (
+        db.session.query(
+            shows.c.id,
+            db.func.count().filter(shows.c.counted_upcoming).label("upcoming"),
+            db.func.count().filter(db.not_(shows.c.counted_upcoming)).label("past"),
+        )
+        .group_by(shows.c.id)
+        .subquery()
+    )
+    result = db.session.execute(
+        model.__table__.update()
+        .where(model.id == counts.c.id)
+        .values(
+            upcoming_shows_count=model.upcoming_shows_count - counts.c.upcoming,
+            past_shows_count=model.past_shows_count - counts.c.past,
+            shows_changed_at=db.func.clock_timestamp(),
+        )
+        .returning(model.id)
+    )
+    return [row.id for row in result]
+
+
+def release_venue_shows(venue_ids):
+    """Uncounts venues' shows from their artists before the venues are deleted.
+
+    Returns the ids of the artists whose counters changed.
+    """
+    return _release_shows(Artist, Show.artist_id, Show.venue_id.in_(venue_ids))
+
+
+def release_artist_shows(artist_ids):
+    """Uncounts artists' shows from their venues before the artists are deleted.
+
+    Returns the ids of the venues whose counters changed.
+    """
+    return _release_shows(Venue, Show.venue_id, Show.artist_id.in_(artist_ids))
+
+
+ROLL_OVER = text(
+    """
+    WITH moved AS (
+        UPDATE shows SET counted_upcoming = false
+        WHERE counted_upcoming AND start_time <= :now
+        RETURNING venue_id, artist_id
+    ), venue_counts AS (
+        UPDATE venues
+        SET upcoming_shows_count = upcoming_shows_count - c.n,
+            past_shows_count = past_shows_count + c.n,
+            shows_changed_at = clock_timestamp()
+        FROM (SELECT venue_id, count(*) AS n FROM moved GROUP BY venue_id) c
+        WHERE venues.id = c.venue_id
+    ), artist_counts AS (
+        UPDATE artists
+        SET upcoming_shows_count = upcoming_shows_count - c.n,
+            past_shows_count = past_shows_count + c.n,
+            shows_changed_at = clock_timestamp()
+        FROM (SELECT artist_id, count(*) AS n FROM moved GROUP BY artist_id) c
+        WHERE artists.id = c.artist_id
+    )
+    SELECT count(*) FROM moved
+    """
+)
+
+
+def roll_over(now=None):
+    """Moves shows that have started since the last run from upcoming to past.
+
+    Meant to run periodically (`flask counters rollover`); returns the
+    number of shows moved.
+    """
+    return db.session.execute(ROLL_OVER, {"now": now or datetime.now()}).scalar()
+
+
+DRIFT = """
+    SELECT e.id, e.upcoming_shows_count, e.past_shows_count,
+           coalesce(c.upcoming, 0) AS upcoming, coalesce(c.past, 0) AS past
+    FROM {table} e
+    LEFT JOIN (
+        SELECT {key} AS id,
+               count(*) FILTER (WHERE counted_upcoming) AS upcoming,
+               count(*) FILTER (WHERE NOT counted_upcoming) AS past
+        FROM shows GROUP BY {key}
+    ) c ON c.id = e.id
+    WHERE e.upcoming_shows_count <> coalesce(c.upcoming, 0)
+       OR e.past_shows_count <> coalesce(c.past, 0)
+"""
+
+REPAIR = """
+    UPDATE {table} e
+    SET upcoming_shows_count = d.upcoming, past_shows_count = d.past,
+        shows_changed_at = clock_timestamp()
+    FROM ({drift}) d
+    WHERE e.id = d.id
+"""
+
+
+def verify(repair=False, now=None):
+    """Compares the counters with the shows table.
+
+    Returns {table: [drifted rows]}. With `repair`, misclassified shows are
+    reflagged first and the drifted counters are rewritten.
+    """
+    if repair:
+        db.session.execute(
+            text(
+                "UPDATE shows SET counted_upcoming = (start_time > :now) "
+                "WHERE counted_upcoming <> (start_time > :now)"
+            ),
+            {"now": now or datetime.now()},
+        )
+    drift = {}
+    for table, key in COUNTED_TABLES:
+        query = DRIFT.format(table=table, key=key)
+        drift[table] = db.session.execute(text(query)).fetchall()
+        if repair and drift[table]:
+            db.session.execute(text(REPAIR.format(table=table, drift=query)))
+    return drift
@@ -0,0 +1,54 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from fyyur import db
+
+# ----------------------------------------------------------------------------#
+#                             Duplicate detection.
+# ----------------------------------------------------------------------------#
+# A venue or artist is a duplicate of another when their dedup keys match:
+# name, city and address compared case-insensitively with whitespace runs
+# folded, and phone numbers compared by their digits. Unique expression
+# indexes over the keys (see models.py) reject duplicates, so inserts use
+# ON CONFLICT DO NOTHING and a duplicate is a single indexed statement that
+# inserts nothing, even between concurrent submits.
+#
+# The key functions take a column collection (`Model.__table__.c`, or any
+# table with the same column names), so the same expressions serve the
+# indexes and the queries that have to match them. The patterns avoid
+# backslashes, which the DDL compiler would escape differently.
+
+
+def folded(column):
+    return func.lower(func.regexp_replace(func.btrim(column), "[[:space:]]+", " ", "g"))
+
+
+def digits(column):
+    return func.regexp_replace(column, "[^0-9]", "", "g")
+
+
+def venue_key(c):
+    return (folded(c.name), folded(c.city), c.state, folded(c.address), digits(c.phone))
+
+
+def artist_key(c):
+    return (folded(c.name), folded(c.city), c.state, digits(c.phone))
+
+
+def show_key(c):
+    return (c.artist_id, c.venue_id, c.start_time)
+
+
+def insert_new(model, values):
+    """Inserts a row of `values` into `model`'s table unless it duplicates one.
+
+    Keys of `values` that are not columns are ignored. Returns the new row,
+    with every column, or None for a duplicate.
+    """
+    return db.session.execute(insert_new_statement(model, values)).first()
+
+
+def insert_new_statement(model, values):
+    """The INSERT ... ON CONFLICT DO NOTHING RETURNING of `insert_new`."""
+    table = model.__table__
+    values = {key: value for key, value in values.items() if key in table.c}
+    return insert(table).values(values).on_conflict_do_nothing().returning(*table.c)
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from flask import Response, abort, request, stream_with_context
+from fyyur import app, db
+from fyyur.models import Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+#                              Catalogue export.
+# ----------------------------------------------------------------------------#
+# Whole tables are streamed as NDJSON or CSV: rows come from a server-side
+# cursor (`yield_per`), are encoded as they arrive and leave in chunks of
+# CHUNK_BYTES, gzipped on the fly when asked to. Memory use stays flat
+# whatever the size of the table, and the export reads one snapshot since
+# it runs in a single transaction.
+
+BATCH_SIZE = 2000
+CHUNK_BYTES = 64 * 1024
+
+TABLES = {"venues": Venue, "artists": Artist, "shows": Show}
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# maintained by fyyur.counters, not part of the catalogue
+INTERNAL_COLUMNS = {
+    "upcoming_shows_count", "past_shows_count", "counted_upcoming", "shows_changed_at"
+}
+
+
+def export_columns(model):
+    return [
+        getattr(model, column.key)
+        for column in model.__table__.columns
+        if column.key not in INTERNAL_COLUMNS
+    ]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ",".join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(names, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(names, row)), default=_json_default, separators=(",", ":"))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            yield "\n".join(lines) + "\n"
+            lines, size = [], 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(table, format, gzip=False):
+    """Yields the encoded bytes of `table` ("venues", "artists" or "shows")
+    in `format` ("ndjson" or "csv"), ordered by id."""
+    model = TABLES[table]
+    columns = export_columns(model)
+    names = [column.key for column in columns]
+    rows = db.session.query(*columns).order_by(model.id).yield_per(BATCH_SIZE)
+    encode = ndjson_chunks if format == "ndjson" else csv_chunks
+    chunks = (text.encode() for text in encode(names, rows))
+    return gzipped(chunks) if gzip else chunks
+
+
+@app.route("/export/<table>.<format>")
+def export_table(table, format):
+    """Streams a whole table, gzipped for clients that accept it."""
+    if table not in TABLES or format not in FORMATS:
+        abort(404)
+    gzip = "gzip" in request.accept_encodings
+    response = Response(
+        stream_with_context(export(table, format, gzip=gzip)), mimetype=FORMATS[format]
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={table}.{format}"
+    response.vary.add("Accept-Encoding")
+    if gzip:
+        response.content_encoding = "gzip"
+    return response
@@ -0,0 +1,165 @@
+from datetime import datetime, timezone
+from flask import Response, abort, request, stream_with_context
+from fyyur import app, db
+from fyyur.models import Venue, Artist, Show
+from fyyur.queries import as_timestamptz
+
+# ----------------------------------------------------------------------------#
+#                              iCalendar feeds.
+# ----------------------------------------------------------------------------#
+# /venues/<id>.ics and /artists/<id>.ics list their upcoming shows for
+# calendar apps, which poll them often. A poll first reads the venue's or
+# artist's name and shows_changed_at, stamped whenever its shows are added,
+# removed or start (see fyyur.counters) or their partner is renamed; that
+# stamp is the feed's ETag and Last-Modified, so an unchanged feed is a 304
+# after this primary key lookup. Otherwise the next FEED_SHOWS shows are
+# read as one range of the (venue_id or artist_id, start_time) index and
+# streamed as they are encoded.
+
+FEED_SHOWS = 500
+BATCH_SIZE = 100
+CHUNK_BYTES = 16 * 1024
+# content lines are folded beyond this many octets (RFC 5545, 3.1)
+LINE_OCTETS = 75
+
+PRODUCT_ID = "-//Fyyur//Shows//EN"
+
+
+def escape(text):
+    """Escapes a TEXT value (RFC 5545, 3.3.11)."""
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """`line` ended by CRLF, continued on lines starting with a space after
+    every LINE_OCTETS octets, without splitting a UTF-8 sequence."""
+    parts = []
+    part, size = [], 0
+    for char in line:
+        octets = len(char.encode())
+        # continuation lines spend one octet on their leading space
+        if size + octets > LINE_OCTETS - (1 if parts else 0):
+            parts.append("".join(part))
+            part, size = [], 0
+        part.append(char)
+        size += octets
+    parts.append("".join(part))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ics_datetime(value):
+    # show times are floating local times, as stored
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def ics_timestamp(value):
+    # DTSTAMP is in UTC (RFC 5545, 3.8.7.2)
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def event_lines(show, summary, location, stamp):
+    yield "BEGIN:VEVENT"
+    yield f"UID:show-{show.id}@fyyur"
+    yield f"DTSTAMP:{stamp}"
+    yield f"DTSTART:{ics_datetime(show.start_time)}"
+    yield f"DTEND:{ics_datetime(show.end_time)}"
+    yield f"SUMMARY:{escape(summary)}"
+    yield f"LOCATION:{escape(location)}"
+    yield "END:VEVENT"
+
+
+def calendar(name, events, changed_at):
+    """Yields the iCalendar text named `name`, UTF-8 encoded, in chunks of
+    at least CHUNK_BYTES.
+
+    `events` yields (show, summary, location); DTSTAMP is `changed_at`, an
+    aware datetime, so the text of an unchanged feed stays the same.
+    """
+    stamp = ics_timestamp(changed_at)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODUCT_ID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    chunk = ["".join(fold(line) for line in lines).encode()]
+    size = len(chunk[0])
+    for event in events:
+        text = "".join(fold(line) for line in event_lines(*event, stamp)).encode()
+        chunk.append(text)
+        size += len(text)
+        if size >= CHUNK_BYTES:
+            yield b"".join(chunk)
+            chunk, size = [], 0
+    chunk.append(fold("END:VCALENDAR").encode())
+    yield b"".join(chunk)
+
+
+def upcoming(key, entity_id, partner, partner_key):
+    """The next FEED_SHOWS shows with `key` == `entity_id`, with the name of
+    their `partner` (the artist of a venue's show, or the other way round)."""
+    return (
+        db.session.query(Show.id, Show.start_time, Show.end_time, partner.name)
+        .join(partner, partner.id == partner_key)
+        .filter(key == entity_id, Show.start_time > datetime.now())
+        .order_by(Show.start_time, Show.id)
+        .limit(FEED_SHOWS)
+        .yield_per(BATCH_SIZE)
+    )
+
+
+def feed(model, entity_id, events):
+    """The feed of a venue or artist, or 304 when the client has its version."""
+    entity = (
+        db.session.query(model.name, as_timestamptz(model.shows_changed_at).label("changed_at"))
+        .filter(model.id == entity_id)
+        .first()
+    )
+    if entity is None:
+        abort(404)
+    response = Response(
+        stream_with_context(calendar(entity.name, events(entity.name), entity.changed_at)),
+        mimetype="text/calendar",
+    )
+    response.set_etag(f"{model.__tablename__}-{entity_id}-{entity.changed_at.timestamp()}")
+    response.last_modified = entity.changed_at
+    response.cache_control.no_cache = True
+    # else make_conditional would read the whole body, and run its query,
+    # to set a Content-Length, even for a 304
+    response.implicit_sequence_conversion = False
+    return response.make_conditional(request)
+
+
+@app.route("/venues/<int:venue_id>.ics")
+def venue_feed(venue_id):
+    def events(venue_name):
+        for show in upcoming(Show.venue_id, venue_id, Artist, Show.artist_id):
+            yield show, show.name, venue_name
+
+    return feed(Venue, venue_id, events)
+
+
+@app.route("/artists/<int:artist_id>.ics")
+def artist_feed(artist_id):
+    def events(artist_name):
+        for show in upcoming(Show.artist_id, artist_id, Venue, Show.venue_id):
+            yield show, f"{artist_name} at {show.name}", show.name
+
+    return feed(Artist, artist_id, events)
+
+
+def touch(model, ids):
+    """Stamps the feeds of `ids` as changed, when names they list change."""
+    if ids:
+        db.session.execute(
+            model.__table__.update()
+            .where(model.id.in_(ids))
+            .values(shows_changed_at=db.func.clock_timestamp())
+        )
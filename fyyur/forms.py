@@ -1,10 +1,14 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, URL, ValidationError, Optional, AnyOf
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, URL, ValidationError, Optional, AnyOf, NumberRange
 from fyyur.enums import Genre, State
+from fyyur.scheduling import duration_error, FREQUENCIES, MAX_SERIES_SHOWS
 import re
 
+# ids are PostgreSQL integers
+MAX_ID = 2 ** 31 - 1
+
 
 class ShowForm(FlaskForm):
     artist_id = StringField(
@@ -20,18 +24,68 @@ class ShowForm(FlaskForm):
         validators=[DataRequired(message='Invalid time. Please enter again !')],
         default=datetime.today()
     )
+    # empty: DEFAULT_SHOW_DURATION after the start, see fyyur.scheduling
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
+
+    def validate(self):
+        if not super().validate():
+            return False
+        error = duration_error(self.start_time.data, self.end_time.data)
+        if error:
+            self.end_time.errors.append(error)
+            return False
+        return True
     
     def validate_artist_id(self, field):
-        if not re.match(r"[0-9]*$", field.data):
+        if not re.fullmatch(r"[0-9]*", field.data) or int(field.data or 0) > MAX_ID:
             raise ValidationError(
                 u"Artist Id should be a number !")
             
     def validate_venue_id(self, field):
-        if not re.match(r"[0-9]*$", field.data):
+        if not re.fullmatch(r"[0-9]*", field.data) or int(field.data or 0) > MAX_ID:
             raise ValidationError(
                 u"Venue Id should be a number !")
 
 
+class SeriesForm(ShowForm):
+    """A show and how it recurs, ending after `count` shows or at `until`."""
+
+    frequency = SelectField(
+        'frequency',
+        validators=[DataRequired()],
+        choices=[(frequency, frequency.capitalize()) for frequency in FREQUENCIES],
+        default="WEEKLY"
+    )
+    interval = IntegerField(
+        'interval',
+        validators=[DataRequired(), NumberRange(min=1, max=52)],
+        default=1
+    )
+    count = IntegerField(
+        'count',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SERIES_SHOWS)]
+    )
+    until = DateTimeField(
+        'until',
+        validators=[Optional()]
+    )
+
+    def validate(self):
+        if not super().validate():
+            return False
+        if not self.count.data and not self.until.data:
+            self.count.errors.append("Give a number of shows or an end date !")
+            return False
+        # the first show is at the start time, so no show is before it
+        if self.until.data and self.until.data < self.start_time.data:
+            self.until.errors.append("The end date should be after the first show !")
+            return False
+        return True
+
+
 class VenueForm(FlaskForm):
     name = StringField(
         'name', 
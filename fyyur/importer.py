@@ -0,0 +1,455 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from flask import request, abort, jsonify
+from sqlalchemy import and_, column, exists, func, or_, select, table, text
+from sqlalchemy.dialects.postgresql import insert
+from wtforms import BooleanField, DateTimeField, SelectMultipleField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import StopValidation, ValidationError
+from fyyur import app, db, cache, counters, scheduling
+from fyyur.dedup import venue_key, artist_key, show_key
+from fyyur.forms import VenueForm, ArtistForm, ShowForm
+from fyyur.models import Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+#                               Bulk import.
+# ----------------------------------------------------------------------------#
+# Loads venues, artists or shows from CSV or NDJSON. Each record is checked
+# with the validators and choices declared on the matching form in
+# fyyur/forms.py, run against a lightweight stand-in for the bound field,
+# so no form is instantiated per row. Valid rows are loaded in chunks of
+# CHUNK_SIZE: COPY into a temporary staging table, one query dropping the
+# rows whose dedup key (see fyyur.dedup) repeats in the chunk or the table,
+# then INSERT ... ON CONFLICT DO NOTHING. Shows referencing missing venues
+# or artists are looked up once per chunk, and shows overlapping another
+# show of their venue or artist (see fyyur.scheduling), in the table or
+# earlier in the file, are skipped by the same insert and reported as
+# conflicts. Empty optional fields are stored as NULL. Rows that fail are
+# listed in the report with their line number and errors, the others are
+# loaded in a single transaction.
+
+CHUNK_SIZE = 5000
+FORMATS = ("csv", "ndjson")
+
+FALSE_VALUES = {"", "false", "f", "0", "no", "n", "off"}
+
+
+def _copy_value(value):
+    if isinstance(value, list):
+        elements = (element.replace("\\", "\\\\").replace('"', '\\"') for element in value)
+        return "{" + ",".join(f'"{element}"' for element in elements) + "}"
+    return value
+
+
+def copy_rows(table, rows):
+    """Loads `rows`, dicts with the same keys, into the table named `table` with COPY."""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # an unquoted empty value is NULL to COPY
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+class _Field:
+    """The parts of a bound WTForms field that validators use."""
+
+    __slots__ = ("name", "data", "raw_data", "errors")
+
+    def __init__(self, name, data, raw):
+        self.name = name
+        self.data = data
+        self.raw_data = [] if raw is None or raw == "" else [raw]
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def _parse_boolean(raw):
+    if isinstance(raw, bool):
+        return raw
+    return raw is not None and str(raw).strip().lower() not in FALSE_VALUES
+
+
+def _parse_list(raw):
+    if raw is None or raw == "":
+        return []
+    if isinstance(raw, str):
+        return [value.strip() for value in raw.split(",") if value.strip()]
+    return [str(value) for value in raw]
+
+
+def _parse_datetime(raw):
+    if raw is None or raw == "":
+        return None
+    try:
+        value = datetime.fromisoformat(str(raw))
+    except ValueError:
+        raise ValueError("Not a valid datetime value")
+    if value.tzinfo is not None:
+        # show times are naive local times, like datetime.now()
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parse_string(raw):
+    return "" if raw is None else str(raw)
+
+
+class _Rule:
+    """How one form field parses and validates a raw value."""
+
+    # values like states, cities and genres repeat across rows, so results
+    # are memoized, up to this many distinct values per field
+    MEMO_SIZE = 4096
+
+    def __init__(self, form_class, name, unbound):
+        self.name = name
+        field_class = unbound.field_class
+        self.validators = list(unbound.kwargs.get("validators") or ())
+        inline = getattr(form_class, f"validate_{name}", None)
+        if inline is not None:
+            # called unbound, with no form, like the other validators
+            self.validators.append(inline)
+        choices = unbound.kwargs.get("choices")
+        self.choices = {value for value, _ in choices} if choices is not None else None
+        self.multiple = issubclass(field_class, SelectMultipleField)
+        if issubclass(field_class, BooleanField):
+            self.parse = _parse_boolean
+        elif self.multiple:
+            self.parse = _parse_list
+        elif issubclass(field_class, DateTimeField):
+            self.parse = _parse_datetime
+        else:
+            self.parse = _parse_string
+        self._memo = {}
+
+    def check(self, raw):
+        """Returns (value, errors) for `raw`, as the form would."""
+        key = tuple(raw) if isinstance(raw, list) else raw
+        try:
+            result = self._memo.get(key)
+        except TypeError:
+            # objects and nested lists from NDJSON are not memoized
+            return self._check(raw)
+        if result is None:
+            result = self._check(raw)
+            if len(self._memo) >= self.MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = result
+        return result
+
+    def _check(self, raw):
+        try:
+            data = self.parse(raw)
+        except ValueError as error:
+            return None, [str(error)]
+        field = _Field(self.name, data, raw)
+        if self.choices is not None and data:
+            if self.multiple:
+                field.errors.extend(
+                    f"'{value}' is not a valid choice for this field"
+                    for value in data if value not in self.choices
+                )
+            elif data not in self.choices:
+                field.errors.append("Not a valid choice")
+        for validator in self.validators:
+            try:
+                validator(None, field)
+            except StopValidation as error:
+                if error.args and error.args[0]:
+                    field.errors.append(error.args[0])
+                break
+            except ValidationError as error:
+                field.errors.append(error.args[0])
+        return data, field.errors
+
+
+class Loader:
+    """Validates records against a form's rules and loads them into `model`."""
+
+    # columns loaded besides the form fields
+    extra_columns = ()
+
+    def __init__(self, model, form_class, dedup_key):
+        self.model = model
+        self.dedup_key = dedup_key
+        fields = sorted(
+            (
+                (name, value)
+                for name, value in vars(form_class).items()
+                if isinstance(value, UnboundField)
+            ),
+            key=lambda item: item[1].creation_counter,
+        )
+        # like the create handlers, copy the form fields the model has
+        self.rules = [
+            _Rule(form_class, name, unbound)
+            for name, unbound in fields
+            if hasattr(model, name)
+        ]
+        self.columns = [rule.name for rule in self.rules] + list(self.extra_columns)
+        self.staging = table(
+            f"import_{model.__tablename__}",
+            *(column(name) for name in self.columns + ["import_line"]),
+        )
+
+    def validate(self, record):
+        """Returns (row, errors) where errors maps field names to messages."""
+        row, errors = {}, {}
+        for rule in self.rules:
+            row[rule.name], field_errors = rule.check(record.get(rule.name))
+            if field_errors:
+                errors[rule.name] = field_errors
+        return row, errors
+
+    def prepare_staging(self):
+        """Creates, or empties, the staging table for this transaction."""
+        db.session.execute(
+            text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {self.staging.name} ON COMMIT DROP AS"
+                f" SELECT {', '.join(self.columns)}, 0 AS import_line"
+                f" FROM {self.model.__tablename__} WITH NO DATA"
+            )
+        )
+        db.session.execute(text(f"TRUNCATE {self.staging.name}"))
+
+    def remove_duplicates(self):
+        """Deletes staged rows that repeat an earlier line's key or a row
+        already in the table; returns their line numbers.
+
+        The key expressions are those of the unique index, so the lookup
+        into the table is an index probe per staged row.
+        """
+        staging, target = self.staging, self.model.__table__
+        key = self.dedup_key(staging.c)
+        ranked = select(
+            staging.c.import_line,
+            func.row_number()
+            .over(partition_by=key, order_by=staging.c.import_line)
+            .label("rank"),
+            exists()
+            .where(and_(*(a == b for a, b in zip(self.dedup_key(target.c), key))))
+            .label("stored"),
+        ).subquery()
+        duplicates = select(ranked.c.import_line).where(or_(ranked.c.rank > 1, ranked.c.stored))
+        result = db.session.execute(
+            staging.delete()
+            .where(staging.c.import_line.in_(duplicates))
+            .returning(staging.c.import_line)
+        )
+        return sorted(line for line, in result)
+
+    def reference_errors(self, rows):
+        """{index: errors} for rows referencing missing entities."""
+        return {}
+
+    def load(self, numbered_rows, report):
+        """Inserts the non-duplicate rows of [(line, row)]; returns the
+        inserted rows."""
+        if not numbered_rows:
+            return []
+        rows = [dict(row, import_line=line) for line, row in numbered_rows]
+        self.before_copy(rows)
+        self.prepare_staging()
+        copy_rows(self.staging.name, rows)
+        report.duplicates.extend(self.remove_duplicates())
+        target = self.model.__table__
+        # rows committed concurrently since the check are skipped, not errors
+        inserted = db.session.execute(
+            insert(target)
+            .from_select(
+                self.columns, select(*(self.staging.c[name] for name in self.columns))
+            )
+            .on_conflict_do_nothing()
+            .returning(*target.c)
+        ).fetchall()
+        self.after_insert(inserted)
+        report.inserted += len(inserted)
+        return inserted
+
+    def before_copy(self, rows):
+        pass
+
+    def after_insert(self, rows):
+        pass
+
+
+class ShowLoader(Loader):
+    extra_columns = ("counted_upcoming",)
+
+    def validate(self, record):
+        row, errors = super().validate(record)
+        if not errors:
+            error = scheduling.duration_error(row["start_time"], row["end_time"])
+            if error:
+                errors["end_time"] = [error]
+        return row, errors
+
+    def load(self, numbered_rows, report):
+        """Also reports the rows left out by the exclusion constraints."""
+        skipped = len(report.duplicates)
+        inserted = super().load(numbered_rows, report)
+        skipped = set(report.duplicates[skipped:])
+        booked = {(row.venue_id, row.artist_id, row.start_time) for row in inserted}
+        report.conflicts.extend(
+            line
+            for line, row in numbered_rows
+            if line not in skipped
+            and (row["venue_id"], row["artist_id"], row["start_time"]) not in booked
+        )
+        return inserted
+
+    def reference_errors(self, rows):
+        errors = {}
+        for model, key in ((Venue, "venue_id"), (Artist, "artist_id")):
+            ids = {int(row[key]) for row in rows}
+            found = {entity_id for entity_id, in db.session.query(model.id).filter(model.id.in_(ids))}
+            for index, row in enumerate(rows):
+                row[key] = int(row[key])
+                if row[key] not in found:
+                    errors.setdefault(index, {})[key] = [
+                        f"{model.__name__} {row[key]} does not exist."
+                    ]
+        return errors
+
+    def before_copy(self, rows):
+        now = datetime.now()
+        for row in rows:
+            row["end_time"] = scheduling.end_time_for(row["start_time"], row["end_time"])
+            row["counted_upcoming"] = counters.counted_upcoming(row["start_time"], now)
+
+    def after_insert(self, rows):
+        counters.shows_added(rows)
+
+
+LOADERS = {
+    "venues": Loader(Venue, VenueForm, venue_key),
+    "artists": Loader(Artist, ArtistForm, artist_key),
+    "shows": ShowLoader(Show, ShowForm, show_key),
+}
+
+
+class Report:
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = []  # line numbers
+        self.conflicts = []  # line numbers of shows overlapping another
+        self.errors = []  # (line number, {field: [messages]})
+        self.venue_ids = set()
+        self.artist_ids = set()
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "conflicts": self.conflicts,
+            "errors": [{"line": line, "errors": errors} for line, errors in self.errors],
+        }
+
+
+def read_records(lines, format):
+    """Yields (line number, record) from an iterable of text lines; a record
+    that cannot be decoded is yielded as an error message string."""
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield number, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(record, dict):
+            yield number, "Expected a JSON object."
+            continue
+        yield number, record
+
+
+def import_records(table, records):
+    """Validates and loads (line number, record) pairs into `table`.
+
+    Runs in the caller's transaction and returns a Report.
+    """
+    loader = LOADERS[table]
+    report = Report()
+    chunk = []
+    for line, record in records:
+        if isinstance(record, str):
+            report.errors.append((line, {"": [record]}))
+            continue
+        row, errors = loader.validate(record)
+        if errors:
+            report.errors.append((line, errors))
+            continue
+        chunk.append((line, row))
+        if len(chunk) == CHUNK_SIZE:
+            _load_chunk(loader, chunk, report)
+            chunk = []
+    if chunk:
+        _load_chunk(loader, chunk, report)
+    report.errors.sort(key=lambda error: error[0])
+    return report
+
+
+def _load_chunk(loader, chunk, report):
+    reference_errors = loader.reference_errors([row for _, row in chunk])
+    for index, errors in reference_errors.items():
+        report.errors.append((chunk[index][0], errors))
+    rows = loader.load(
+        [item for index, item in enumerate(chunk) if index not in reference_errors], report
+    )
+    if loader.model is Show:
+        report.venue_ids.update(row.venue_id for row in rows)
+        report.artist_ids.update(row.artist_id for row in rows)
+
+
+def run_import(table, lines, format):
+    """Imports and commits, then invalidates the cached pages it changed."""
+    try:
+        report = import_records(table, read_records(lines, format))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if report.inserted:
+        if table == "venues":
+            cache.venue_created()
+        elif table == "artists":
+            cache.artist_created()
+        else:
+            cache.shows_created(report.venue_ids, report.artist_ids)
+    return report
+
+
+@app.route("/import/<table>", methods=["POST"])
+def import_table(table):
+    """Imports an uploaded CSV or NDJSON `file`; replies with the report.
+
+    The format comes from `format`, or else the file's extension.
+    """
+    upload = request.files.get("file")
+    if table not in LOADERS or upload is None:
+        abort(404 if table not in LOADERS else 400)
+    format = request.values.get("format") or upload.filename.rpartition(".")[2].lower()
+    if format not in FORMATS:
+        abort(400, description=f"Unsupported format '{format}', use csv or ndjson.")
+    lines = codecs.iterdecode(upload.stream, "utf-8-sig")
+    report = run_import(table, lines, format)
+    return jsonify(report.to_dict())
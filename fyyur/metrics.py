@@ -0,0 +1,270 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import (
+    Response,
+    abort,
+    jsonify,
+    g,
+    has_request_context,
+    request,
+    request_started,
+    request_finished,
+    before_render_template,
+    template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from fyyur import app, db
+from fyyur.cache import pages
+from fyyur.pool import pool_stats
+
+# ----------------------------------------------------------------------------#
+#                          Request instrumentation.
+# ----------------------------------------------------------------------------#
+# Every request records its SQL query count, time spent in the database,
+# template render time, total duration and response size, per endpoint.
+# The histograms are exposed in the Prometheus text format at /metrics.
+# They are kept per process: with several workers, scrape each of them.
+#
+# Set SLOW_REQUEST_SECONDS to log requests slower than that, together with
+# the SQL statements they ran.
+#
+# /metrics and /diagnostics/pool reveal pool sizes, replicas and timings:
+# with METRICS_TOKEN set they answer requests bearing it only, else they
+# are served in debug and testing only.
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+
+
+class Histogram:
+    """A labelled Prometheus histogram, safe to observe from several threads."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            counts, total = self._series.get(label, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[label] = (counts, total + value)
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted((label, list(counts), total)
+                            for label, (counts, total) in self._series.items())
+        for label, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{{endpoint="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{endpoint="{label}"}} {cumulative}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "fyyur_request_duration_seconds", "Time to handle a request.", SECONDS_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "fyyur_request_queries", "SQL statements executed per request.", COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "fyyur_request_db_seconds", "Time spent executing SQL per request.", SECONDS_BUCKETS
+)
+REQUEST_RENDER_TIME = Histogram(
+    "fyyur_request_render_seconds", "Time spent rendering templates per request.",
+    SECONDS_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "fyyur_response_size_bytes", "Size of buffered response bodies.", BYTES_BUCKETS
+)
+HISTOGRAMS = (
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUEST_DB_TIME,
+    REQUEST_RENDER_TIME,
+    RESPONSE_SIZE,
+)
+
+
+class RequestStats:
+    def __init__(self, capture_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.statements = [] if capture_statements else None
+
+
+def _stats():
+    return g.get("request_stats") if has_request_context() else None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.statements is not None:
+            stats.statements.append((elapsed, statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+@request_started.connect_via(app)
+def _request_started(sender, **extra):
+    g.request_stats = RequestStats(sender.config.get("SLOW_REQUEST_SECONDS") is not None)
+
+
+@before_render_template.connect_via(app)
+def _before_render_template(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None:
+        stats.render_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _template_rendered(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None and stats.render_started is not None:
+        stats.render_time += time.perf_counter() - stats.render_started
+        stats.render_started = None
+
+
+@request_finished.connect_via(app)
+def _request_finished(sender, response, **extra):
+    stats = _stats()
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.started
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_DURATION.observe(endpoint, duration)
+    REQUEST_QUERIES.observe(endpoint, stats.queries)
+    REQUEST_DB_TIME.observe(endpoint, stats.db_time)
+    REQUEST_RENDER_TIME.observe(endpoint, stats.render_time)
+    if response.content_length is not None:
+        RESPONSE_SIZE.observe(endpoint, response.content_length)
+
+    threshold = sender.config.get("SLOW_REQUEST_SECONDS")
+    if threshold is not None and duration >= threshold:
+        statements = "".join(
+            f"\n  [{elapsed * 1000:.1f}ms] {statement}"
+            for elapsed, statement in stats.statements
+        )
+        sender.logger.warning(
+            "Slow request %s %s: %.3fs, %d queries, %.3fs in DB, %.3fs rendering%s",
+            request.method, request.full_path, duration, stats.queries,
+            stats.db_time, stats.render_time, statements,
+        )
+
+
+def diagnostics(view):
+    """Answers 404 to requests not allowed to see `view`, see above."""
+
+    @wraps(view)
+    def wrapper(**view_args):
+        token = app.config["METRICS_TOKEN"]
+        if token:
+            allowed = hmac.compare_digest(
+                request.headers.get("Authorization", ""), f"Bearer {token}"
+            )
+        else:
+            allowed = app.debug or app.testing
+        if not allowed:
+            abort(404)
+        return view(**view_args)
+
+    return wrapper
+
+
+@app.route("/metrics")
+@diagnostics
+def metrics():
+    """Exposes the request histograms in the Prometheus text format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    for name, kind, value in (
+        ("fyyur_page_cache_hits_total", "counter", pages.hits),
+        ("fyyur_page_cache_misses_total", "counter", pages.misses),
+        ("fyyur_page_cache_evictions_total", "counter", pages.evictions),
+        ("fyyur_page_cache_entries", "gauge", len(pages)),
+        ("fyyur_page_cache_bytes", "gauge", pages.size),
+    ):
+        lines.extend([f"# TYPE {name} {kind}", f"{name} {value}"])
+    if db.replicas.replicas:
+        lines.append("# TYPE fyyur_replica_healthy gauge")
+        lines.extend(
+            f'fyyur_replica_healthy{{bind="{replica.bind}"}} {int(replica.healthy)}'
+            for replica in db.replicas.replicas
+        )
+        lines.append("# TYPE fyyur_replica_lag_seconds gauge")
+        lines.extend(
+            f'fyyur_replica_lag_seconds{{bind="{replica.bind}"}} {replica.lag}'
+            for replica in db.replicas.replicas
+        )
+    pools = engine_pools()
+    for name, key in (
+        ("fyyur_pool_checked_out", "checked_out"),
+        ("fyyur_pool_overflow", "overflow"),
+        ("fyyur_pool_checkouts_total", "checkouts"),
+        ("fyyur_pool_timeouts_total", "timeouts"),
+        ("fyyur_pool_wait_seconds_total", "wait_seconds_total"),
+    ):
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(
+            f'{name}{{bind="{bind}"}} {stats[key]}'
+            for bind, stats in pools.items() if key in stats
+        )
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def engine_pools():
+    """Pool statistics of the primary and every replica engine, by bind."""
+    pools = {"primary": pool_stats(db.engine)}
+    for replica in db.replicas.replicas:
+        pools[replica.bind] = pool_stats(db.replicas.engine(replica.bind))
+    return pools
+
+
+@app.route("/diagnostics/pool")
+@diagnostics
+def pool_diagnostics():
+    """Connection pool statistics of this worker, as JSON.
+
+    `checked_out` and `overflow` are the current use, against `size` and
+    `max_overflow`; `checkouts`, `timeouts` and the wait times accumulate
+    since the worker started. A pool that often overflows, or whose
+    checkouts wait, is too small for the worker's threads.
+    """
+    return jsonify(engine_pools())
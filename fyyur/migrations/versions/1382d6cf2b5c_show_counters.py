@@ -0,0 +1,61 @@
+"""show counters
+
+Revision ID: 1382d6cf2b5c
+Revises: 38844a3375f1
+Create Date: 2026-10-18 10:12:41.208317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1382d6cf2b5c'
+down_revision = '38844a3375f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venues', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('venues', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('shows', sa.Column('counted_upcoming', sa.Boolean(), server_default='false', nullable=False))
+
+    # backfill from the existing shows
+    op.execute("UPDATE shows SET counted_upcoming = start_time > now()")
+    for table, key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(
+            f"""
+            UPDATE {table} e
+            SET upcoming_shows_count = c.upcoming, past_shows_count = c.past
+            FROM (
+                SELECT {key} AS id,
+                       count(*) FILTER (WHERE counted_upcoming) AS upcoming,
+                       count(*) FILTER (WHERE NOT counted_upcoming) AS past
+                FROM shows GROUP BY {key}
+            ) c
+            WHERE e.id = c.id
+            """
+        )
+    # built concurrently, once the backfill is committed, so shows stay
+    # writable meanwhile; see a4f27be9c013 on a failed build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_shows_counted_upcoming_start_time', 'shows', ['start_time'], unique=False,
+            postgresql_where=sa.text('counted_upcoming'), postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_shows_counted_upcoming_start_time', table_name='shows',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('shows', 'counted_upcoming')
+    op.drop_column('artists', 'past_shows_count')
+    op.drop_column('artists', 'upcoming_shows_count')
+    op.drop_column('venues', 'past_shows_count')
+    op.drop_column('venues', 'upcoming_shows_count')
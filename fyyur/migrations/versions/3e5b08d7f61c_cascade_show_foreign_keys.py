@@ -0,0 +1,51 @@
+"""cascade show foreign keys
+
+Revision ID: 3e5b08d7f61c
+Revises: c92e6d1f4a8b
+Create Date: 2026-10-18 20:26:43.118904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e5b08d7f61c'
+down_revision = 'c92e6d1f4a8b'
+branch_labels = None
+depends_on = None
+
+# (shows column, referenced table)
+FOREIGN_KEYS = [('venue_id', 'venues'), ('artist_id', 'artists')]
+
+NON_CASCADING = sa.text(
+    """
+    SELECT c.conname FROM pg_constraint c
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY (c.conkey)
+    WHERE c.conrelid = 'shows'::regclass AND c.contype = 'f'
+      AND a.attname = :column AND c.confdeltype <> 'c'
+    """
+)
+
+
+def upgrade():
+    # 73c15fce7287 made these keys ON DELETE CASCADE, but databases built
+    # from the models before they declared it still have NO ACTION. Deletes
+    # now rely on the cascade (the relationships are passive_deletes), so
+    # recreate any key that lacks it. NOT VALID skips the scan under the
+    # exclusive lock, VALIDATE then checks the rows without blocking writes.
+    bind = op.get_bind()
+    for column, table in FOREIGN_KEYS:
+        for name, in bind.execute(NON_CASCADING, {'column': column}).fetchall():
+            op.drop_constraint(name, 'shows', type_='foreignkey')
+            op.execute(
+                f"ALTER TABLE shows ADD CONSTRAINT shows_{column}_fkey"
+                f" FOREIGN KEY ({column}) REFERENCES {table} (id)"
+                f" ON DELETE CASCADE NOT VALID"
+            )
+            op.execute(f"ALTER TABLE shows VALIDATE CONSTRAINT shows_{column}_fkey")
+
+
+def downgrade():
+    # the cascade belongs to 73c15fce7287, keep it
+    pass
@@ -0,0 +1,59 @@
+"""show series
+
+Revision ID: 4b9e2d71c8a5
+Revises: d2b7f90c3a61
+Create Date: 2026-10-18 21:58:44.671203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e2d71c8a5'
+down_revision = 'd2b7f90c3a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'show_series',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('rule', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_show_series_venue_id', 'show_series', ['venue_id'])
+    op.create_index('ix_show_series_artist_id', 'show_series', ['artist_id'])
+    op.add_column('shows', sa.Column('series_id', sa.Integer(), nullable=True))
+    # see 3e5b08d7f61c: the key is validated without blocking writes to shows
+    op.execute(
+        "ALTER TABLE shows ADD CONSTRAINT shows_series_id_fkey FOREIGN KEY (series_id)"
+        " REFERENCES show_series (id) ON DELETE SET NULL NOT VALID"
+    )
+    op.execute("ALTER TABLE shows VALIDATE CONSTRAINT shows_series_id_fkey")
+    # see a4f27be9c013 on building concurrently
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_shows_series_id_start_time', 'shows', ['series_id', 'start_time'],
+            postgresql_where=sa.text('series_id IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_shows_series_id_start_time', table_name='shows', postgresql_concurrently=True
+        )
+    op.drop_constraint('shows_series_id_fkey', 'shows', type_='foreignkey')
+    op.drop_column('shows', 'series_id')
+    op.drop_index('ix_show_series_artist_id', table_name='show_series')
+    op.drop_index('ix_show_series_venue_id', table_name='show_series')
+    op.drop_table('show_series')
@@ -0,0 +1,68 @@
+"""search indexes
+
+Revision ID: 5d0e4c1b9a7f
+Revises: 1382d6cf2b5c
+Create Date: 2026-10-18 14:37:05.612950
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e4c1b9a7f'
+down_revision = '1382d6cf2b5c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # d7c461b2355a left artists.genres as VARCHAR although the model maps an
+    # ARRAY; convert it where that is still the case.
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'artists' AND column_name = 'genres') <> 'ARRAY' THEN
+                ALTER TABLE artists ALTER COLUMN genres TYPE VARCHAR(120)[]
+                    USING string_to_array(trim(both '{}' from genres), ',');
+            END IF;
+        END
+        $$
+        """
+    )
+    # array_to_string() is only STABLE, so the document is wrapped in a
+    # function declared IMMUTABLE to make it usable in an expression index.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION fyyur_search_document(
+            name text, city text, state text, genres text[]
+        ) RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce(array_to_string(genres, ' '), '')), 'C')
+        $$
+        """
+    )
+    # see a4f27be9c013 on building concurrently
+    with op.get_context().autocommit_block():
+        for table in ('venues', 'artists'):
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY ix_{table}_search_document ON {table} "
+                f"USING gin (fyyur_search_document(name, city, state, genres))"
+            )
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY ix_{table}_name_trgm ON {table} "
+                f"USING gin (name gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('venues', 'artists'):
+            op.drop_index(f'ix_{table}_name_trgm', table_name=table, postgresql_concurrently=True)
+            op.drop_index(
+                f'ix_{table}_search_document', table_name=table, postgresql_concurrently=True
+            )
+    op.execute("DROP FUNCTION fyyur_search_document(text, text, text, text[])")
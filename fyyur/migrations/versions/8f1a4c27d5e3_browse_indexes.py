@@ -0,0 +1,41 @@
+"""browse indexes
+
+Revision ID: 8f1a4c27d5e3
+Revises: 3e5b08d7f61c
+Create Date: 2026-10-18 21:12:30.406571
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f1a4c27d5e3'
+down_revision = '3e5b08d7f61c'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial index predicate); genres filters use the
+# GIN indexes of a4f27be9c013 and venue areas ix_venues_state_city_name_id
+INDEXES = [
+    ('ix_artists_state_city', 'artists', ['state', 'city'], None),
+    ('ix_venues_seeking_state_city', 'venues', ['state', 'city'], 'seeking_talent'),
+    ('ix_artists_seeking_state_city', 'artists', ['state', 'city'], 'seeking_venue'),
+]
+
+
+def upgrade():
+    # see a4f27be9c013 on building concurrently
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
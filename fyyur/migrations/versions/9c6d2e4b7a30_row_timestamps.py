@@ -0,0 +1,62 @@
+"""row timestamps
+
+Rows existing at the upgrade get its time as both created_at and
+updated_at: nothing recorded when they were created or last changed.
+
+Revision ID: 9c6d2e4b7a30
+Revises: e5a3c8f09b12
+Create Date: 2026-10-18 22:41:52.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c6d2e4b7a30'
+down_revision = 'e5a3c8f09b12'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+# every UPDATE stamps the rows it touches, whichever code issues it: the
+# ORM, fyyur.counters or fyyur.feeds. clock_timestamp(), as in
+# fyyur.counters, so a writer waiting on the row lock stamps it later.
+SET_UPDATED_AT = """
+    CREATE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    # now() is evaluated once for the default, so existing rows are not
+    # rewritten
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+        op.add_column(
+            table,
+            sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+    op.execute(SET_UPDATED_AT)
+    for table in TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_updated_at BEFORE UPDATE ON {table}"
+            f" FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.execute(f"DROP TRIGGER {table}_updated_at ON {table}")
+    op.execute("DROP FUNCTION set_updated_at()")
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
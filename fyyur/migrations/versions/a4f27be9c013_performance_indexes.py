@@ -0,0 +1,45 @@
+"""performance indexes
+
+Revision ID: a4f27be9c013
+Revises: 5d0e4c1b9a7f
+Create Date: 2026-10-18 17:02:54.090143
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f27be9c013'
+down_revision = '5d0e4c1b9a7f'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, index method); see benchmarks/explain.py for the
+# route queries each one serves
+INDEXES = [
+    ('ix_shows_start_time_id', 'shows', ['start_time', 'id'], None),
+    ('ix_shows_venue_id_start_time_id', 'shows', ['venue_id', 'start_time', 'id'], None),
+    ('ix_shows_artist_id_start_time_id', 'shows', ['artist_id', 'start_time', 'id'], None),
+    ('ix_venues_state_city_name_id', 'venues', ['state', 'city', 'name', 'id'], None),
+    ('ix_artists_name_id', 'artists', ['name', 'id'], None),
+    ('ix_venues_genres', 'venues', ['genres'], 'gin'),
+    ('ix_artists_genres', 'artists', ['genres'], 'gin'),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and does not
+    # block writes while it builds. If a build fails it leaves an INVALID
+    # index behind: drop it and rerun the upgrade.
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_using=using, postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,89 @@
+"""dedup keys
+
+Revision ID: c92e6d1f4a8b
+Revises: a4f27be9c013
+Create Date: 2026-10-18 19:41:07.512386
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c92e6d1f4a8b'
+down_revision = 'a4f27be9c013'
+branch_labels = None
+depends_on = None
+
+
+def folded(column):
+    return f"lower(regexp_replace(btrim({column}), '[[:space:]]+', ' ', 'g'))"
+
+
+def digits(column):
+    return f"regexp_replace({column}, '[^0-9]', '', 'g')"
+
+
+# (name, table, shows column referencing it, key expressions); the same
+# keys as fyyur.dedup
+ENTITY_KEYS = [
+    ('uq_venues_dedup_key', 'venues', 'venue_id',
+     [folded('name'), folded('city'), 'state', folded('address'), digits('phone')]),
+    ('uq_artists_dedup_key', 'artists', 'artist_id',
+     [folded('name'), folded('city'), 'state', digits('phone')]),
+]
+SHOW_KEY = ('uq_shows_dedup_key', 'shows', None, ['artist_id', 'venue_id', 'start_time'])
+
+MERGE = """
+    CREATE TEMP TABLE {table}_merged ON COMMIT DROP AS
+    SELECT id, keep FROM (
+        SELECT id, min(id) OVER (PARTITION BY {key}) AS keep FROM {table}
+    ) k WHERE id <> keep;
+    UPDATE shows SET {reference} = m.keep
+    FROM {table}_merged m WHERE shows.{reference} = m.id;
+    DELETE FROM {table} USING {table}_merged m WHERE {table}.id = m.id;
+"""
+
+RECOUNT = """
+    UPDATE {table} e
+    SET upcoming_shows_count = coalesce(c.upcoming, 0),
+        past_shows_count = coalesce(c.past, 0)
+    FROM {table} t
+    LEFT JOIN (
+        SELECT {reference} AS id,
+               count(*) FILTER (WHERE counted_upcoming) AS upcoming,
+               count(*) FILTER (WHERE NOT counted_upcoming) AS past
+        FROM shows GROUP BY {reference}
+    ) c ON c.id = t.id
+    WHERE e.id = t.id
+      AND (e.upcoming_shows_count, e.past_shows_count)
+          IS DISTINCT FROM (coalesce(c.upcoming, 0), coalesce(c.past, 0))
+"""
+
+
+def upgrade():
+    # Existing duplicates would fail the unique indexes: their shows move to
+    # the oldest entity with the key, then repeated shows are dropped and
+    # the counters of the survivors recounted.
+    for _, table, reference, key in ENTITY_KEYS:
+        op.execute(MERGE.format(table=table, reference=reference, key=', '.join(key)))
+    op.execute(
+        "DELETE FROM shows s USING shows t"
+        " WHERE s.artist_id = t.artist_id AND s.venue_id = t.venue_id"
+        " AND s.start_time = t.start_time AND s.id > t.id"
+    )
+    for _, table, reference, _ in ENTITY_KEYS:
+        op.execute(RECOUNT.format(table=table, reference=reference))
+    # see a4f27be9c013 on building concurrently; a row duplicating another
+    # inserted while the index builds makes it fail, rerun the upgrade
+    with op.get_context().autocommit_block():
+        for name, table, _, key in ENTITY_KEYS + [SHOW_KEY]:
+            op.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({', '.join(key)})"
+            )
+
+
+def downgrade():
+    # merged duplicates are not restored
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(ENTITY_KEYS + [SHOW_KEY]):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,80 @@
+"""show end time, no double bookings
+
+Revision ID: d2b7f90c3a61
+Revises: 8f1a4c27d5e3
+Create Date: 2026-10-18 21:41:08.215347
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7f90c3a61'
+down_revision = '8f1a4c27d5e3'
+branch_labels = None
+depends_on = None
+
+# shows starting together at one venue, or of one artist, cannot both be
+# kept; they have to be resolved (deleted or moved) by hand first
+DOUBLE_BOOKINGS = """
+    SELECT s.id, o.id
+    FROM shows s
+    JOIN shows o ON o.start_time = s.start_time AND o.id > s.id
+        AND (o.venue_id = s.venue_id OR o.artist_id = s.artist_id)
+    ORDER BY s.id
+    LIMIT 20
+"""
+
+# existing shows get the default 2 hours, cut short where the next show at
+# their venue or of their artist starts earlier
+BACKFILL = """
+    UPDATE shows SET end_time = least(
+        shows.start_time + interval '2 hours', next.venue_start, next.artist_start
+    )
+    FROM (
+        SELECT
+            id,
+            lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time) AS venue_start,
+            lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time) AS artist_start
+        FROM shows
+    ) AS next
+    WHERE next.id = shows.id
+"""
+
+# see fyyur.scheduling; building them locks shows against writes meanwhile.
+# They are built after the backfill commits: in its transaction, every
+# probe of the build also visits the rows the backfill replaced.
+CONSTRAINTS = [
+    ('ex_shows_venue_booking', 'venue_id'),
+    ('ex_shows_artist_booking', 'artist_id'),
+]
+
+
+def upgrade():
+    connection = op.get_bind()
+    pairs = connection.execute(sa.text(DOUBLE_BOOKINGS)).fetchall()
+    if pairs:
+        raise RuntimeError(
+            "Shows at the same venue or of the same artist start at the same time,"
+            " delete or move one of each pair before upgrading: "
+            + ", ".join(f"{first} and {second}" for first, second in pairs)
+        )
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute(BACKFILL)
+    op.alter_column('shows', 'end_time', nullable=False)
+    op.create_check_constraint('ck_shows_end_after_start', 'shows', 'end_time > start_time')
+    with op.get_context().autocommit_block():
+        for name, column in CONSTRAINTS:
+            op.execute(
+                f"ALTER TABLE shows ADD CONSTRAINT {name} EXCLUDE USING gist"
+                f" (int4range({column}, {column}, '[]') WITH =,"
+                f" tsrange(start_time, end_time) WITH &&)"
+            )
+
+
+def downgrade():
+    for name, _ in reversed(CONSTRAINTS):
+        op.drop_constraint(name, 'shows')
+    op.drop_constraint('ck_shows_end_after_start', 'shows')
+    op.drop_column('shows', 'end_time')
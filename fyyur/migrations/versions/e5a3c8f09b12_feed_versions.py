@@ -0,0 +1,31 @@
+"""feed versions
+
+Revision ID: e5a3c8f09b12
+Revises: 4b9e2d71c8a5
+Create Date: 2026-10-18 22:20:17.308455
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a3c8f09b12'
+down_revision = '4b9e2d71c8a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # now() is evaluated once for the default, so existing rows are not
+    # rewritten; they all start at the upgrade's version
+    for table in ('venues', 'artists'):
+        op.add_column(
+            table,
+            sa.Column('shows_changed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'shows_changed_at')
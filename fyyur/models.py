@@ -1,4 +1,7 @@
+from sqlalchemy import DDL, event
 from fyyur import db
+from fyyur.dedup import venue_key, artist_key, show_key
+from fyyur.scheduling import double_booking_constraint, end_time_for
 from datetime import datetime
 
 # ----------------------------------------------------------------------------#
@@ -7,6 +10,25 @@ from datetime import datetime
 
 class Venue(db.Model):
     __tablename__ = "venues"
+    __table_args__ = (
+        # keyset order of the /venues listing, also serves area lookups
+        db.Index("ix_venues_state_city_name_id", "state", "city", "name", "id"),
+        db.Index("ix_venues_genres", "genres", postgresql_using="gin"),
+        # substring search on names, see fyyur.search
+        db.Index(
+            "ix_venues_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # browsing venues seeking talent, see fyyur.browse
+        db.Index(
+            "ix_venues_seeking_state_city",
+            "state",
+            "city",
+            postgresql_where=db.text("seeking_talent"),
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(), nullable=False)
     city = db.Column(db.String(120), nullable=False)
@@ -19,11 +41,33 @@ class Venue(db.Model):
     website_link = db.Column(db.String())
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
+    # maintained by fyyur.counters, never written directly
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # the version of its feed, see fyyur.feeds
+    shows_changed_at = db.Column(
+        db.DateTime, nullable=False, server_default=db.func.now()
+    )
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    # stamped by a trigger on every update, counters included; the version
+    # of its page, see fyyur.cache.versioned_page
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=db.func.now(),
+        server_onupdate=db.FetchedValue(),
+    )
+    # shows go with their venue through ON DELETE CASCADE, without being loaded
     shows = db.relationship(
         "Show", 
         backref="venues", 
         lazy=True, 
-        cascade="all, delete-orphan" 
+        cascade="all, delete-orphan",
+        passive_deletes=True,
         )
 
     def __repr__(self):
@@ -32,6 +76,25 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = "artists"
+    __table_args__ = (
+        # keyset order of the /artists listing, also serves name lookups
+        db.Index("ix_artists_name_id", "name", "id"),
+        db.Index("ix_artists_genres", "genres", postgresql_using="gin"),
+        db.Index(
+            "ix_artists_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # browsing by area, and artists seeking venues, see fyyur.browse
+        db.Index("ix_artists_state_city", "state", "city"),
+        db.Index(
+            "ix_artists_seeking_state_city",
+            "state",
+            "city",
+            postgresql_where=db.text("seeking_venue"),
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
@@ -43,11 +106,33 @@ class Artist(db.Model):
     website_link = db.Column(db.String())
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String())
+    # maintained by fyyur.counters, never written directly
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # the version of its feed, see fyyur.feeds
+    shows_changed_at = db.Column(
+        db.DateTime, nullable=False, server_default=db.func.now()
+    )
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    # stamped by a trigger on every update, counters included; the version
+    # of its page, see fyyur.cache.versioned_page
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=db.func.now(),
+        server_onupdate=db.FetchedValue(),
+    )
+    # shows go with their artist through ON DELETE CASCADE, without being loaded
     shows = db.relationship(
         "Show",
         backref="artists",
         lazy=True,
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     def __repr__(self):
@@ -56,19 +141,163 @@ class Artist(db.Model):
 
 class Show(db.Model):
     __tablename__ = "shows"
+    __table_args__ = (
+        # keyset order of /shows, alone or filtered by venue or artist
+        db.Index("ix_shows_start_time_id", "start_time", "id"),
+        db.Index("ix_shows_venue_id_start_time_id", "venue_id", "start_time", "id"),
+        db.Index("ix_shows_artist_id_start_time_id", "artist_id", "start_time", "id"),
+        # lets the counters roll-over find newly past shows without a scan
+        db.Index(
+            "ix_shows_counted_upcoming_start_time",
+            "start_time",
+            postgresql_where=db.text("counted_upcoming"),
+        ),
+        # an empty range would overlap nothing, escaping the constraints below
+        db.CheckConstraint("end_time > start_time", name="ck_shows_end_after_start"),
+        # the upcoming shows of a series, rescheduled or cancelled together
+        db.Index(
+            "ix_shows_series_id_start_time",
+            "series_id",
+            "start_time",
+            postgresql_where=db.text("series_id IS NOT NULL"),
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(
         db.Integer, 
-        db.ForeignKey("artists.id"), 
+        db.ForeignKey("artists.id", ondelete="CASCADE"), 
         nullable=False
     )
     venue_id = db.Column(
         db.Integer, 
-        db.ForeignKey("venues.id"), 
+        db.ForeignKey("venues.id", ondelete="CASCADE"), 
         nullable=False
     )
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.now())
+    # defaults to start_time plus DEFAULT_SHOW_DURATION, see fyyur.scheduling
+    end_time = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=lambda context: end_time_for(
+            context.get_current_parameters()["start_time"], None
+        ),
+    )
+    # whether the show is counted in upcoming_shows_count (else past_shows_count)
+    counted_upcoming = db.Column(
+        db.Boolean, nullable=False, default=False, server_default="false"
+    )
+    # past shows stay when their series is cancelled
+    series_id = db.Column(
+        db.Integer,
+        db.ForeignKey("show_series.id", ondelete="SET NULL"),
+    )
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    # stamped by a trigger on every update
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=db.func.now(),
+        server_onupdate=db.FetchedValue(),
+    )
 
     def __repr__(self):
         return f"<Show {self.artist_id} {self.venue_id} {self.start_time}>"
 
+
+class ShowSeries(db.Model):
+    """Recurring shows of an artist at a venue, see fyyur.scheduling."""
+
+    __tablename__ = "show_series"
+    __table_args__ = (
+        # deleting a venue or artist cascades to its series
+        db.Index("ix_show_series_venue_id", "venue_id"),
+        db.Index("ix_show_series_artist_id", "artist_id"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(
+        db.Integer,
+        db.ForeignKey("artists.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    venue_id = db.Column(
+        db.Integer,
+        db.ForeignKey("venues.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    # the first show; the others recur on `rule` with the same duration
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    rule = db.Column(db.String(), nullable=False)
+
+    def __repr__(self):
+        return f"<ShowSeries {self.id} {self.rule}>"
+
+
+# unique dedup keys, see fyyur.dedup; expressions need the table built first
+db.Index("uq_venues_dedup_key", *venue_key(Venue.__table__.c), unique=True)
+db.Index("uq_artists_dedup_key", *artist_key(Artist.__table__.c), unique=True)
+db.Index("uq_shows_dedup_key", *show_key(Show.__table__.c), unique=True)
+
+# full-text search documents, see fyyur.search; array_to_string() is only
+# STABLE, so the document is a function declared IMMUTABLE to be indexable
+event.listen(
+    db.Model.metadata,
+    "before_create",
+    DDL(
+        """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE OR REPLACE FUNCTION fyyur_search_document(
+            name text, city text, state text, genres text[]
+        ) RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce(array_to_string(genres, ' '), '')), 'C')
+        $$
+        """
+    ).execute_if(dialect="postgresql"),
+)
+
+# every UPDATE stamps updated_at, see migration 9c6d2e4b7a30
+event.listen(
+    db.Model.metadata,
+    "before_create",
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := clock_timestamp();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    ).execute_if(dialect="postgresql"),
+)
+for table in (Venue.__table__, Artist.__table__, Show.__table__):
+    event.listen(
+        table,
+        "after_create",
+        DDL(
+            "CREATE TRIGGER %(table)s_updated_at BEFORE UPDATE ON %(table)s"
+            " FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+        ).execute_if(dialect="postgresql"),
+    )
+
+
+def search_document(c):
+    return db.func.fyyur_search_document(c.name, c.city, c.state, c.genres)
+
+
+db.Index(
+    "ix_venues_search_document", search_document(Venue.__table__.c), postgresql_using="gin"
+)
+db.Index(
+    "ix_artists_search_document", search_document(Artist.__table__.c), postgresql_using="gin"
+)
+
+# no double booking of a venue or an artist, see fyyur.scheduling
+Show.__table__.append_constraint(
+    double_booking_constraint("ex_shows_venue_booking", Show.__table__.c, "venue_id")
+)
+Show.__table__.append_constraint(
+    double_booking_constraint("ex_shows_artist_booking", Show.__table__.c, "artist_id")
+)
@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from flask import request, abort, url_for
+from sqlalchemy import tuple_
+
+# ----------------------------------------------------------------------------#
+#                            Keyset pagination.
+# ----------------------------------------------------------------------------#
+# Pages are addressed by an opaque cursor holding the sort key of the last
+# row shown, and the next page is fetched with a row-value comparison on
+# that key, e.g. (name, id) > ('Blue Moon', 42). With an index on the sort
+# key every page is an index seek, so deep pages cost the same as page 1.
+
+PAGE_SIZE = 50
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, keys):
+    """Decodes `cursor` back into values typed like `keys`, or aborts with 400."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(payload) != len(keys):
+            raise ValueError("cursor does not match the sort key")
+        values = []
+        for key, value in zip(keys, payload):
+            python_type = key.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise TypeError("cursor value has the wrong type")
+            values.append(value)
+        return values
+    except (ValueError, TypeError):
+        abort(400, description="Invalid cursor.")
+
+
+def keyset_query(query, keys, cursor=None, per_page=PAGE_SIZE, descending=False):
+    """Narrows `query` to the page after `cursor`, plus one row to detect a next page."""
+    if cursor:
+        values = tuple_(*decode_cursor(cursor, keys))
+        after = tuple_(*keys) < values if descending else tuple_(*keys) > values
+        query = query.filter(after)
+    order = [key.desc() for key in keys] if descending else keys
+    return query.order_by(None).order_by(*order).limit(per_page + 1)
+
+
+def keyset_page(query, keys, cursor=None, per_page=PAGE_SIZE, descending=False):
+    """Returns (rows, next_cursor) for the page of `query` after `cursor`.
+
+    `keys` are the columns of a unique sort key, each selected by `query`
+    under its own name. `next_cursor` is None on the last page.
+    """
+    rows = keyset_query(query, keys, cursor, per_page, descending).all()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+
+def page_url(cursor, param="cursor"):
+    """URL of the current view with `param` set to `cursor`, keeping other args."""
+    args = request.args.to_dict()
+    args[param] = cursor
+    # the view's own arguments win over query args of the same name
+    return url_for(request.endpoint, **{**args, **request.view_args})
+
+
+def pager(next_cursor, param="cursor"):
+    """Links for the pager include: the next page and, past page 1, the first."""
+    return {
+        "next_url": page_url(next_cursor, param) if next_cursor else None,
+        "first_url": page_url(None, param) if request.args.get(param) else None,
+    }
+
+
+def wants_json():
+    return request.args.get("format") == "json"
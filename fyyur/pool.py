@@ -0,0 +1,74 @@
+import threading
+import time
+from flask import has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# ----------------------------------------------------------------------------#
+#                             Connection pools.
+# ----------------------------------------------------------------------------#
+# Postgres engines use TimedQueuePool, which counts how long checkouts wait
+# for a connection (including opening a new one) and how many time out, so
+# pool sizes can be chosen from what /diagnostics/pool reports.
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool recording the time spent getting connections."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def pool_stats(engine):
+    """What `engine`'s pool holds now, and its checkout waits so far."""
+    pool = engine.pool
+    stats = {"status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # overflow() counts down from -size while the pool fills
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            wait_seconds_total=round(pool.wait_seconds, 6),
+            wait_seconds_max=round(pool.max_wait_seconds, 6),
+        )
+    return stats
+
+
+def limit_statements(engine, milliseconds):
+    """Sets a statement timeout on every transaction begun while handling a
+    request. SET LOCAL ends with the transaction, which keeps it correct
+    behind PgBouncer's transaction pooling."""
+
+    @event.listens_for(engine, "begin")
+    def set_timeout(connection):
+        if has_request_context():
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(milliseconds)}")
@@ -0,0 +1,277 @@
+from datetime import datetime
+from sqlalchemy import and_, exists, func, or_, literal, null, select, union_all
+from sqlalchemy.dialects.postgresql import ARRAY
+from fyyur import db
+from fyyur.models import Venue, Artist, Show
+from fyyur.scheduling import slot, period, MAX_SHOW_DURATION
+
+# ----------------------------------------------------------------------------#
+#                                 Queries.
+# ----------------------------------------------------------------------------#
+
+def shows_listing(start=None, end=None, venue_id=None, artist_id=None):
+    """Projects shows with their venue and artist columns in one query.
+
+    Only the columns the listing renders are selected, so no ORM objects
+    are hydrated and no per-row lookups are issued. `start`/`end` bound
+    `start_time` to the half-open window [start, end).
+    """
+    query = (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.end_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Venue, Venue.id == Show.venue_id)
+        .join(Artist, Artist.id == Show.artist_id)
+    )
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    if venue_id is not None:
+        query = query.filter(Show.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(Show.artist_id == artist_id)
+    return query
+
+
+def show_conflicts(venue_id, artist_id, start_time, end_time):
+    """Shows at the venue or of the artist overlapping [start_time, end_time).
+
+    Each condition is that of an exclusion constraint (see fyyur.scheduling),
+    so the lookup is a probe of each constraint's GiST index, whatever the
+    number of shows.
+    """
+    booked = period(Show.start_time, Show.end_time).op("&&")(period(start_time, end_time))
+    return (
+        db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+        .filter(
+            or_(
+                and_(slot(Show.venue_id) == slot(venue_id), booked),
+                and_(slot(Show.artist_id) == slot(artist_id), booked),
+            )
+        )
+        .order_by(Show.start_time)
+    )
+
+
+def series_conflicts(venue_id, artist_id, periods):
+    """Shows at the venue or of the artist overlapping any of `periods`,
+    [(start_time, end_time)], with the start of the period they overlap.
+
+    The periods are passed as two arrays and each probes the exclusion
+    constraints' indexes as `show_conflicts` does, from a lateral subquery.
+    Its OFFSET 0 keeps the planner from flattening it into one scan of
+    every show of the venue and artist, filtered by period afterwards.
+    """
+    wanted = func.unnest(
+        db.cast([start for start, _ in periods], ARRAY(db.DateTime)),
+        db.cast([end for _, end in periods], ARRAY(db.DateTime)),
+    ).table_valued("start_time", "end_time").render_derived(name="wanted")
+    booked = period(Show.start_time, Show.end_time).op("&&")(
+        period(wanted.c.start_time, wanted.c.end_time)
+    )
+    overlapping = (
+        db.session.query(
+            Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time
+        )
+        .filter(
+            or_(
+                and_(slot(Show.venue_id) == slot(venue_id), booked),
+                and_(slot(Show.artist_id) == slot(artist_id), booked),
+            )
+        )
+        .offset(0)
+        .subquery("overlapping")
+        .lateral()
+    )
+    return (
+        db.session.query(
+            wanted.c.start_time.label("occurrence"),
+            overlapping.c.id,
+            overlapping.c.venue_id,
+            overlapping.c.artist_id,
+            overlapping.c.start_time,
+            overlapping.c.end_time,
+        )
+        .select_from(wanted)
+        .join(overlapping, db.true())
+        .order_by(wanted.c.start_time, overlapping.c.start_time)
+    )
+
+
+def references_exist(venue_id, artist_id):
+    """(venue exists, artist exists), in one query."""
+    return db.session.query(
+        exists().where(Venue.id == venue_id), exists().where(Artist.id == artist_id)
+    ).one()
+
+
+def venue_shows(venue_id):
+    """Projects a venue's shows with the artist columns its page renders."""
+    return (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+        )
+        .join(Artist, Artist.id == Show.artist_id)
+        .filter(Show.venue_id == venue_id)
+    )
+
+
+def artist_shows(artist_id):
+    """Projects an artist's shows with the venue columns its page renders."""
+    return (
+        db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link"),
+        )
+        .join(Venue, Venue.id == Show.venue_id)
+        .filter(Show.artist_id == artist_id)
+    )
+
+
+def venue_calendar(venue_id, start, end):
+    """The shows at a venue running during [start, end), and the free
+    periods between them, in one query ordered by time.
+
+    Free periods are the rows without a show id. Shows cannot overlap at a
+    venue, so they are the gaps between each show's end and the next one's
+    start, computed over the window's shows with lag(). Those are read as
+    one range of ix_shows_venue_id_start_time_id: a show running into the
+    window started at most MAX_SHOW_DURATION before it.
+    """
+    booked = (
+        select(
+            Show.id.label("show_id"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Show.start_time,
+            Show.end_time,
+        )
+        .join(Artist, Artist.id == Show.artist_id)
+        .where(
+            Show.venue_id == venue_id,
+            Show.start_time > start - MAX_SHOW_DURATION,
+            Show.start_time < end,
+            Show.end_time > start,
+        )
+        .cte("booked")
+    )
+    previous_end = func.lag(booked.c.end_time).over(order_by=booked.c.start_time)
+    gaps = union_all(
+        select(
+            func.coalesce(previous_end, start).label("start_time"),
+            booked.c.start_time.label("end_time"),
+        ),
+        # after the last show, or the whole window when there is none
+        select(func.coalesce(func.max(booked.c.end_time), start), literal(end)),
+    ).subquery("gaps")
+    free = select(
+        null().label("show_id"),
+        null().label("artist_id"),
+        null().label("artist_name"),
+        gaps.c.start_time,
+        gaps.c.end_time,
+    ).where(gaps.c.start_time < gaps.c.end_time)
+    calendar = union_all(select(booked), free).subquery("calendar")
+    return db.session.query(calendar).order_by(calendar.c.start_time)
+
+
+def as_timestamptz(column):
+    """`column`, a timestamp without time zone stamped by now() or
+    clock_timestamp(), so in the session's time zone, as a timestamptz."""
+    return func.timezone(func.current_setting("TimeZone"), column)
+
+
+def venue_version(venue_id):
+    """When the venue's page last changed, see fyyur.cache.versioned_page.
+
+    Its updated_at is stamped by its edits, by every show added, removed
+    or started there (with the counters) and by renames of its artists.
+    A show also moves from upcoming to past when it starts, before the
+    counters roll over, so its start counts too.
+    """
+    return _page_version(Venue, Show.venue_id, venue_id)
+
+
+def artist_version(artist_id):
+    """When the artist's page last changed, as for `venue_version`."""
+    return _page_version(Artist, Show.artist_id, artist_id)
+
+
+def _page_version(model, key, entity_id):
+    now = datetime.now()
+    # the last start so far, one probe of the (key, start_time) index
+    started_at = (
+        select(func.max(Show.start_time))
+        .where(key == entity_id, Show.start_time <= now)
+        .scalar_subquery()
+    )
+    row = (
+        db.session.query(as_timestamptz(model.updated_at), started_at)
+        .filter(model.id == entity_id)
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, started_at = row
+    if started_at is None:
+        return updated_at
+    # show times are local to the app, like datetime.now()
+    return max(updated_at, started_at.astimezone())
+
+
+def shows_version(venue_id=None, artist_id=None):
+    """When the shows of a venue or artist (or both) last changed, or None
+    for the whole listing, which every show changes."""
+    versions = []
+    if venue_id is not None:
+        versions.append(select(Venue.updated_at).where(Venue.id == venue_id).scalar_subquery())
+    if artist_id is not None:
+        versions.append(select(Artist.updated_at).where(Artist.id == artist_id).scalar_subquery())
+    if not versions:
+        return None
+    return db.session.query(as_timestamptz(func.greatest(*versions))).scalar()
+
+
+# detail pages list the next upcoming shows, and page through past ones
+UPCOMING_SHOWS_LIMIT = 12
+PAST_SHOWS_PAGE_SIZE = 12
+# availability calendars span a week unless asked otherwise
+CALENDAR_DAYS = 7
+MAX_CALENDAR_DAYS = 31
+
+# keyset sort keys of the listings (see fyyur.pagination); each ends with
+# the primary key so it is unique
+SHOWS_ORDER = (Show.start_time, Show.id)
+VENUES_ORDER = (Venue.state, Venue.city, Venue.name, Venue.id)
+ARTISTS_ORDER = (Artist.name, Artist.id)
+
+
+def venues_listing():
+    """Projects venues with their area and upcoming show count."""
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label("num_upcoming_shows"),
+    )
+
+
+def artists_listing():
+    """Projects the columns of the artists listing."""
+    return db.session.query(Artist.id, Artist.name)
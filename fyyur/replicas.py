@@ -0,0 +1,194 @@
+import itertools
+import logging
+import threading
+import time
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm, text
+from sqlalchemy.exc import DBAPIError
+from fyyur.pool import TimedQueuePool, limit_statements
+
+# ----------------------------------------------------------------------------#
+#                              Read replicas.
+# ----------------------------------------------------------------------------#
+# SQLALCHEMY_REPLICA_URIS become the binds replica_0, replica_1, ... Each GET
+# or HEAD request picks the next healthy replica, round robin, and all its
+# reads go there; other methods, flushes and requests outside of a request
+# context use the primary. A client that committed a write reads from the
+# primary for REPLICA_STICKY_SECONDS afterwards (kept in its session), so the
+# redirect after a form submission shows what was just saved.
+#
+# A replica is checked when picked, at most every REPLICA_CHECK_SECONDS: it
+# is skipped while unreachable or lagging more than REPLICA_MAX_LAG_SECONDS,
+# and as soon as a statement on it fails to connect. With none healthy,
+# reads fall back to the primary. Set a connect_timeout in the replica URIs
+# so a check on an unreachable host fails quickly.
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ("GET", "HEAD")
+STICKY_KEY = "_primary_until"
+
+# replay lag, 0 when the replica has replayed all it received (an idle
+# primary would otherwise look like growing lag) or is not in recovery
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class Replica:
+    def __init__(self, bind):
+        self.bind = bind
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = None
+
+
+class ReplicaPool:
+    """Round-robin choice among the replicas that pass their health check."""
+
+    def __init__(self, binds, get_engine, max_lag, check_seconds, clock=time.monotonic):
+        self.replicas = [Replica(bind) for bind in binds]
+        self.get_engine = get_engine
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self.clock = clock
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._watched = set()
+
+    def choose(self):
+        """The bind name of the next healthy replica, or None for the primary."""
+        for _ in self.replicas:
+            with self._lock:
+                replica = next(self._cycle)
+            if self._healthy(replica):
+                return replica.bind
+        return None
+
+    def failed(self, bind):
+        """Takes `bind` out of rotation until its next check."""
+        for replica in self.replicas:
+            if replica.bind == bind:
+                replica.healthy = False
+                replica.checked_at = self.clock()
+
+    def engine(self, bind):
+        engine = self.get_engine(bind)
+        with self._lock:
+            watched = bind in self._watched
+            self._watched.add(bind)
+        if not watched:
+
+            @event.listens_for(engine, "handle_error")
+            def disconnected(context):
+                if context.is_disconnect or context.connection is None:
+                    logger.warning("replica %s failed, reading from the others", bind)
+                    self.failed(bind)
+
+        return engine
+
+    def _healthy(self, replica):
+        now = self.clock()
+        with self._lock:
+            due = replica.checked_at is None or now - replica.checked_at >= self.check_seconds
+            if due:
+                # concurrent requests keep the last result meanwhile
+                replica.checked_at = now
+        if due:
+            replica.healthy = self._check(replica)
+        return replica.healthy
+
+    def _check(self, replica):
+        engine = self.engine(replica.bind)
+        query = LAG_QUERY if engine.dialect.name == "postgresql" else text("SELECT 0")
+        try:
+            with engine.connect() as connection:
+                replica.lag = float(connection.execute(query).scalar() or 0)
+        except DBAPIError as error:
+            logger.warning("replica %s is unreachable: %s", replica.bind, error)
+            return False
+        if replica.lag > self.max_lag:
+            logger.warning("replica %s lags %.1fs, skipping it", replica.bind, replica.lag)
+            return False
+        return True
+
+
+def read_bind():
+    """The replica bind of the current request, or None for the primary."""
+    return g.get("read_bind") if has_request_context() else None
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        bind = read_bind()
+        if bind is not None and not self._flushing:
+            return get_state(self.app).db.replicas.engine(bind)
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _wrote(session):
+    if has_request_context():
+        g.wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with GET requests routed to read replicas, and
+    instrumented, statement-limited Postgres engines (see fyyur.pool)."""
+
+    def init_app(self, app):
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        replica_binds = []
+        for index, uri in enumerate(app.config.get("SQLALCHEMY_REPLICA_URIS") or ()):
+            replica_binds.append(f"replica_{index}")
+            binds[replica_binds[-1]] = uri
+        app.config["SQLALCHEMY_BINDS"] = binds or None
+        super().init_app(app)
+        self.replicas = ReplicaPool(
+            replica_binds,
+            lambda bind: self.get_engine(app, bind=bind),
+            app.config["REPLICA_MAX_LAG_SECONDS"],
+            app.config["REPLICA_CHECK_SECONDS"],
+        )
+        sticky_seconds = app.config["REPLICA_STICKY_SECONDS"]
+
+        @app.before_request
+        def route_reads():
+            if (
+                self.replicas.replicas
+                and request.method in READ_METHODS
+                and session.get(STICKY_KEY, 0) < time.time()
+            ):
+                g.read_bind = self.replicas.choose()
+
+        @app.after_request
+        def stick_to_primary(response):
+            if g.get("wrote") and self.replicas.replicas:
+                session[STICKY_KEY] = time.time() + sticky_seconds
+            return response
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        if sa_url.drivername.startswith("postgresql"):
+            options.setdefault("poolclass", TimedQueuePool)
+        else:
+            # e.g. SQLite stand-ins, whose default pools take no sizes
+            for name in ("pool_size", "max_overflow", "pool_timeout", "connect_args"):
+                options.pop(name, None)
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        timeout = self.get_app().config.get("STATEMENT_TIMEOUT_MS")
+        if timeout and engine.dialect.name == "postgresql":
+            limit_statements(engine, timeout)
+        return engine
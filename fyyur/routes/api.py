@@ -0,0 +1,246 @@
+from datetime import datetime
+from flask import Blueprint, request, abort, jsonify
+from werkzeug.exceptions import HTTPException
+from fyyur import db, browse
+from fyyur.models import Venue, Artist, Show
+from fyyur.queries import VENUES_ORDER, ARTISTS_ORDER, SHOWS_ORDER
+from fyyur.pagination import keyset_page, PAGE_SIZE
+from fyyur.utils import datetime_arg
+
+#  -------------------------- API v1 --------------------------
+# Read-only JSON for venues, artists and shows. `fields` picks the
+# columns to return (`?fields=id,name`), and only those are selected, so
+# each row is serialized straight from its column tuple. Listings are
+# keyset paginated by `cursor`, up to `limit` rows; venue and artist
+# listings take the filters of fyyur.browse, whose facet counts are served
+# under /facets. Every response carries
+# an ETag, and a matching If-None-Match gets an empty 304.
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_LIMIT = 200
+
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "city": Venue.city,
+    "state": Venue.state,
+    "address": Venue.address,
+    "phone": Venue.phone,
+    "genres": Venue.genres,
+    "image_link": Venue.image_link,
+    "facebook_link": Venue.facebook_link,
+    "website": Venue.website_link,
+    "seeking_talent": Venue.seeking_talent,
+    "seeking_description": Venue.seeking_description,
+    "upcoming_shows_count": Venue.upcoming_shows_count,
+    "past_shows_count": Venue.past_shows_count,
+    "created_at": Venue.created_at,
+    "updated_at": Venue.updated_at,
+}
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "city": Artist.city,
+    "state": Artist.state,
+    "phone": Artist.phone,
+    "genres": Artist.genres,
+    "image_link": Artist.image_link,
+    "facebook_link": Artist.facebook_link,
+    "website": Artist.website_link,
+    "seeking_venue": Artist.seeking_venue,
+    "seeking_description": Artist.seeking_description,
+    "upcoming_shows_count": Artist.upcoming_shows_count,
+    "past_shows_count": Artist.past_shows_count,
+    "created_at": Artist.created_at,
+    "updated_at": Artist.updated_at,
+}
+SHOW_FIELDS = {
+    "id": Show.id,
+    "start_time": Show.start_time,
+    "end_time": Show.end_time,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "venue_image_link": Venue.image_link,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "series_id": Show.series_id,
+    "created_at": Show.created_at,
+    "updated_at": Show.updated_at,
+}
+
+DEFAULT_VENUE_FIELDS = ("id", "name", "city", "state", "upcoming_shows_count")
+DEFAULT_ARTIST_FIELDS = ("id", "name", "city", "state", "upcoming_shows_count")
+DEFAULT_SHOW_FIELDS = (
+    "id", "start_time", "end_time", "venue_id", "venue_name", "artist_id", "artist_name"
+)
+
+
+def selected_fields(available, default):
+    """The field names asked for by `fields`, or `default`; aborts with 400
+    on unknown ones."""
+    value = request.args.get("fields")
+    if not value:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        abort(400, description="Unknown field(s): " + ", ".join(unknown)
+              + ". Available: " + ", ".join(available))
+    return names
+
+
+def project(available, names, keys=()):
+    """A query of the `names` columns, each labelled by its field name,
+    followed by any of the sort `keys` not among them."""
+    columns = [available[name].label(name) for name in names]
+    chosen = {available[name] for name in names}
+    columns.extend(key for key in keys if key not in chosen)
+    return db.session.query(*columns)
+
+
+def serialize(rows, names):
+    """Builds one dict per row from the first len(names) values of its tuple."""
+    data = [dict(zip(names, row)) for row in rows]
+    for item in data:
+        for name, value in item.items():
+            if isinstance(value, datetime):
+                item[name] = value.isoformat()
+    return data
+
+
+def limit_arg():
+    return max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_LIMIT))
+
+
+def conditional(payload):
+    """A JSON response with a content ETag, or 304 if the client has it."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def listing(available, default, query, keys, descending=False):
+    names = selected_fields(available, default)
+    rows, next_cursor = keyset_page(
+        query(project(available, names, keys)),
+        keys,
+        request.args.get("cursor"),
+        per_page=limit_arg(),
+        descending=descending,
+    )
+    return conditional({"data": serialize(rows, names), "next_cursor": next_cursor})
+
+
+def detail(available, model, entity_id):
+    names = selected_fields(available, available)
+    row = project(available, names).filter(model.id == entity_id).one_or_none()
+    if row is None:
+        abort(404, description=f"{model.__name__} {entity_id} does not exist.")
+    return conditional({"data": serialize([row], names)[0]})
+
+
+# the app's HTML handlers for 404 and 500 win over a handler for the base
+# class, so those codes are registered explicitly
+@api.errorhandler(HTTPException)
+@api.errorhandler(404)
+@api.errorhandler(500)
+def api_error(error):
+    return jsonify({"error": error.name, "message": error.description}), error.code
+
+
+def facets(model):
+    total, counts = browse.facet_counts(model, browse.parse_filters(request.args))
+    return conditional({"total": total, "facets": counts})
+
+
+@api.route("/venues")
+def venues():
+    """Venues by state, city and name.
+
+    Optional filters: `genre` (repeatable), `state`, `city`, `seeking`.
+    """
+    filters = browse.parse_filters(request.args)
+    return listing(
+        VENUE_FIELDS,
+        DEFAULT_VENUE_FIELDS,
+        lambda query: browse.filtered(Venue, query, filters),
+        VENUES_ORDER,
+    )
+
+
+@api.route("/venues/facets")
+def venue_facets():
+    """Facet counts of the venues matching the same filters as /venues."""
+    return facets(Venue)
+
+
+@api.route("/venues/<int:venue_id>")
+def venue(venue_id):
+    return detail(VENUE_FIELDS, Venue, venue_id)
+
+
+@api.route("/artists")
+def artists():
+    """Artists by name.
+
+    Optional filters: `genre` (repeatable), `state`, `city`, `seeking`.
+    """
+    filters = browse.parse_filters(request.args)
+    return listing(
+        ARTIST_FIELDS,
+        DEFAULT_ARTIST_FIELDS,
+        lambda query: browse.filtered(Artist, query, filters),
+        ARTISTS_ORDER,
+    )
+
+
+@api.route("/artists/facets")
+def artist_facets():
+    """Facet counts of the artists matching the same filters as /artists."""
+    return facets(Artist)
+
+
+@api.route("/artists/<int:artist_id>")
+def artist(artist_id):
+    return detail(ARTIST_FIELDS, Artist, artist_id)
+
+
+@api.route("/shows")
+def shows():
+    """Shows in chronological order, or latest first with `order=desc`.
+
+    Optional filters: `from`/`to` (datetime window), `venue_id`, `artist_id`.
+    """
+    start, end = datetime_arg("from"), datetime_arg("to")
+    venue_id = request.args.get("venue_id", type=int)
+    artist_id = request.args.get("artist_id", type=int)
+    names = selected_fields(SHOW_FIELDS, DEFAULT_SHOW_FIELDS)
+
+    def query(query):
+        # join only the tables the selected fields come from
+        tables = {SHOW_FIELDS[name].class_ for name in names}
+        query = query.select_from(Show)
+        if Venue in tables:
+            query = query.join(Venue, Venue.id == Show.venue_id)
+        if Artist in tables:
+            query = query.join(Artist, Artist.id == Show.artist_id)
+        if start is not None:
+            query = query.filter(Show.start_time >= start)
+        if end is not None:
+            query = query.filter(Show.start_time < end)
+        if venue_id is not None:
+            query = query.filter(Show.venue_id == venue_id)
+        if artist_id is not None:
+            query = query.filter(Show.artist_id == artist_id)
+        return query
+
+    return listing(
+        SHOW_FIELDS,
+        DEFAULT_SHOW_FIELDS,
+        query,
+        SHOWS_ORDER,
+        descending=request.args.get("order") == "desc",
+    )
@@ -3,71 +3,150 @@ from fyyur import db, app
 from flask import request, flash, render_template, redirect, url_for, jsonify
 from datetime import datetime
 from fyyur.forms import ArtistForm
+from fyyur import search, cache, browse, feeds
+from fyyur.queries import (
+    artists_listing,
+    artist_shows,
+    artist_version,
+    ARTISTS_ORDER,
+    SHOWS_ORDER,
+    UPCOMING_SHOWS_LIMIT,
+    PAST_SHOWS_PAGE_SIZE,
+)
+from fyyur.pagination import keyset_page, pager, wants_json
+from fyyur.counters import release_artist_shows
+from fyyur.dedup import insert_new
+from fyyur.utils import ids_arg
 import sys
 
 #  -------------------------- Artists --------------------------
 
 @app.route("/artists")
+@cache.cached_page
 def artists():
-    """Shows all artists."""
-    artists = Artist.query.all()
+    """Shows all artists.
+
+    Paginated by `cursor`; `format=json` returns the page as JSON.
+    """
+    rows, next_cursor = keyset_page(
+        artists_listing(), ARTISTS_ORDER, request.args.get("cursor")
+    )
     data = []
-    for artist in artists:
+    for artist in rows:
         artist_info = {
             "id": artist.id,
             "name": artist.name,
         }
         data.append(artist_info)
 
-    return render_template("pages/artists.html", artists=data)
+    if wants_json():
+        return jsonify({"data": data, "next_cursor": next_cursor})
+    return render_template("pages/artists.html", artists=data, pager=pager(next_cursor))
+
+
+@app.route("/artists/browse")
+@cache.cached_page
+def browse_artists():
+    """Browses artists by genre, state, city and seeking venues, with facet counts.
 
+    Paginated by `cursor`; `format=json` returns the page and facets as JSON.
+    """
+    filters = browse.parse_filters(request.args)
+    rows, next_cursor = keyset_page(
+        browse.filtered(Artist, browse.browse_listing(Artist), filters),
+        ARTISTS_ORDER,
+        request.args.get("cursor"),
+    )
+    total, facets = browse.facet_counts(Artist, filters)
+    data = []
+    for artist in rows:
+        artist_info = {
+            "id": artist.id,
+            "name": artist.name,
+            "city": artist.city,
+            "state": artist.state,
+            "genres": artist.genres,
+        }
+        data.append(artist_info)
 
-@app.route("/artists/search", methods=["POST"])
+    if wants_json():
+        return jsonify(
+            {"data": data, "next_cursor": next_cursor, "total": total, "facets": facets}
+        )
+    return render_template(
+        "pages/browse.html",
+        kind="artists",
+        results=data,
+        total=total,
+        facets=browse.facet_links(facets, filters),
+        pager=pager(next_cursor),
+    )
+
+
+@app.route("/artists/search", methods=["GET", "POST"])
 def search_artists():
-    """Search artists with partial string search, case-insensitive."""
-    user_input = request.form.get("search_term", "")
-    candidates = Artist.query.filter(Artist.name.ilike(f"%{user_input}%"))
+    """Search artists by name, city, state or genre, ranked and paginated."""
+    user_input = request.values.get("search_term", "")
+    page = request.values.get("page", 1, type=int)
+    rows, total = search.search_artists(user_input, page=page)
     data = []
-    count = 0
-    for candidate in candidates:
-        count += 1
+    for candidate in rows:
         candidate_info = {
             "id": candidate.id,
             "name": candidate.name,
-            "num_upcoming_shows": len(
-                Show.query.filter(Show.artist_id == candidate.id)
-                .filter(Show.start_time > datetime.now())
-                .all()
-            ),
+            "num_upcoming_shows": candidate.num_upcoming_shows,
         }
         data.append(candidate_info)
-    response = {"count": count, "data": data}
+    response = {
+        "count": total,
+        "data": data,
+        "page": page,
+        "pages": search.page_count(total),
+    }
 
     return render_template(
         "pages/search_artists.html",
         results=response,
-        search_term=request.form.get("search_term", ""),
+        search_term=user_input,
     )
 
 
 @app.route("/artists/<int:artist_id>")
+@cache.versioned_page(artist_version)
+@cache.cached_page
 def show_artist(artist_id):
-    """Shows the specific venue page."""
-    artist = Artist.query.filter_by(id=artist_id).first()
+    """Shows the specific artist's page.
+
+    Lists the next upcoming shows and one page of past shows, most recent
+    first, paginated by `past_cursor`. Counts come from the artist's counters.
+    """
+    artist = Artist.query.get(artist_id)
+    if not artist:
+        return render_template("errors/404.html"), 404
+    now = datetime.now()
+    upcoming, more_upcoming = keyset_page(
+        artist_shows(artist_id).filter(Show.start_time > now),
+        SHOWS_ORDER,
+        per_page=UPCOMING_SHOWS_LIMIT,
+    )
+    past, next_past_cursor = keyset_page(
+        artist_shows(artist_id).filter(Show.start_time <= now),
+        SHOWS_ORDER,
+        request.args.get("past_cursor"),
+        per_page=PAST_SHOWS_PAGE_SIZE,
+        descending=True,
+    )
     past_shows = []
     upcoming_shows = []
-    for show in artist.shows:
-        venue = Venue.query.filter_by(id=show.venue_id).first()
-        show_info = {
-            "venue_id": venue.id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        if str(show_info["start_time"]) < str(datetime.now()):
-            past_shows.append(show_info)
-        else:
-            upcoming_shows.append(show_info)
+    for shows, rows in ((upcoming_shows, upcoming), (past_shows, past)):
+        for show in rows:
+            show_info = {
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "venue_image_link": show.venue_image_link,
+                "start_time": show.start_time,
+            }
+            shows.append(show_info)
     artist_info = {
         "id": artist.id,
         "name": artist.name,
@@ -82,11 +161,21 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows_count": artist.past_shows_count,
+        "upcoming_shows_count": artist.upcoming_shows_count,
+        # the listing pages through all of them
+        "all_upcoming_url": url_for(
+            "shows", artist_id=artist_id, **{"from": now.isoformat(timespec="minutes")}
+        )
+        if more_upcoming
+        else None,
     }
 
-    return render_template("pages/show_artist.html", artist=artist_info)
+    return render_template(
+        "pages/show_artist.html",
+        artist=artist_info,
+        pager=pager(next_past_cursor, "past_cursor"),
+    )
 
 
 @app.route("/artists/create", methods=["GET"])
@@ -101,23 +190,10 @@ def create_artist_submission():
     form = ArtistForm(meta={"csrf": False})
     if form.validate_on_submit():
         error = False
-        artist = Artist.query.filter(
-            Artist.name == form.name.data,
-            Artist.city == form.city.data,
-            Artist.state == form.state.data,
-            Artist.phone == form.phone.data,
-        ).first()
-        if artist:
-            flash(
-                form.name.data
-                + " already exits. You cannot add the same artist twice !"
-            )
-            return render_template("pages/home.html")
+        artist = None
         try:
-            new_artist = Artist()
-            for field in form:
-                setattr(new_artist, field.name, field.data)
-            db.session.add(new_artist)
+            # avoid duplicated creation: a duplicate inserts nothing
+            artist = insert_new(Artist, {field.name: field.data for field in form})
             db.session.commit()
         except:
             error = True
@@ -125,10 +201,16 @@ def create_artist_submission():
             print(sys.exc_info())
         finally:
             db.session.close()
-        if not error:
-            flash(request.form["name"] + " was successfully listed !")
-        else:
+        if error:
             flash("Sorry, " + request.form["name"] + " could not be listed !")
+        elif artist is None:
+            flash(
+                form.name.data
+                + " already exits. You cannot add the same artist twice !"
+            )
+        else:
+            cache.artist_created()
+            flash(request.form["name"] + " was successfully listed !")
         return render_template("pages/home.html")
     else:
         for field_name, error_msg in form.errors.items():
@@ -154,8 +236,15 @@ def edit_artist_submission(artist_id):
         error = False
         artist = Artist.query.get(artist_id)
         try:
+            # venue pages show the artist's name and image with its shows
+            renamed = (artist.name, artist.image_link) != (form.name.data, form.image_link.data)
+            venue_ids = cache.artist_venues(artist_id) if renamed else ()
             for field in form:
                 setattr(artist, field.name, field.data)
+            if renamed:
+                # feeds list the names of both
+                feeds.touch(Artist, [artist_id])
+                feeds.touch(Venue, venue_ids)
             db.session.commit()
         except:
             error = True
@@ -164,6 +253,7 @@ def edit_artist_submission(artist_id):
         finally:
             db.session.close()
         if not error:
+            cache.artist_changed(artist_id, venue_ids)
             # give feedback to users with the flashing system
             flash(request.form["name"] + " was successfully updated!")
         else:
@@ -185,6 +275,8 @@ def delete_artist(artist_id):
     try:
         artist = Artist.query.get(artist_id)
         artist_name = artist.name
+        # the venues whose counters change are those listing its shows
+        venue_ids = release_artist_shows([artist_id])
         db.session.delete(artist)
         db.session.commit()
     except:
@@ -194,8 +286,39 @@ def delete_artist(artist_id):
     finally:
         db.session.close()
     if not error:
+        cache.artist_changed(artist_id, venue_ids, counts_changed=True)
         flash(artist_name + " was successfully deleted !")
     else:
         flash("Error occured. " + artist_name + " could not be deleted !")
     return jsonify({'success': True})
 
+
+@app.route("/artists", methods=["DELETE"])
+def delete_artists():
+    """Deletes the artists whose ids are given, see `ids_arg`, in one transaction.
+
+    Their shows go with them through the foreign keys' ON DELETE CASCADE.
+    """
+    artist_ids = ids_arg()
+    error = False
+    deleted = []
+    try:
+        venue_ids = release_artist_shows(artist_ids)
+        result = db.session.execute(
+            Artist.__table__.delete()
+            .where(Artist.id.in_(artist_ids))
+            .returning(Artist.id)
+        )
+        deleted = [row.id for row in result]
+        db.session.commit()
+    except:
+        error = True
+        db.session.rollback()
+        print(sys.exc_info())
+    finally:
+        db.session.close()
+    if error:
+        return jsonify({"success": False}), 500
+    cache.artists_changed(deleted, venue_ids, counts_changed=True)
+    return jsonify({"success": True, "deleted": deleted})
+
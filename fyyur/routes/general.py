@@ -1,5 +1,6 @@
 from fyyur import app
-from flask import render_template
+from fyyur import search
+from flask import request, render_template
 
 # ----------------------------------------------------------------------------#
 #                               Controllers.
@@ -10,6 +11,23 @@ def index():
     return render_template("pages/home.html")
 
 
+@app.route("/search")
+def search_all():
+    """Searches venues and artists together, ranked and paginated."""
+    user_input = request.args.get("search_term", "")
+    page = request.args.get("page", 1, type=int)
+    rows, total = search.search_all(user_input, page=page)
+    results = {
+        "count": total,
+        "data": rows,
+        "page": page,
+        "pages": search.page_count(total),
+    }
+    return render_template(
+        "pages/search.html", results=results, search_term=user_input
+    )
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template("errors/404.html"), 404
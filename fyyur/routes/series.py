@@ -0,0 +1,287 @@
+from fyyur.models import Show, ShowSeries, Venue, Artist
+from fyyur import db, app, cache, format_datetime
+from flask import flash, render_template, redirect, url_for, jsonify
+from fyyur.forms import SeriesForm
+from fyyur.queries import series_conflicts, references_exist
+from fyyur.pagination import wants_json
+from fyyur.counters import counted_upcoming, shows_added, shows_removed
+from fyyur.scheduling import end_time_for, recurrence_rule, rule_fields, occurrences
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+import sys
+
+#  -------------------------- Show series --------------------------
+# A series is created, rescheduled or cancelled as a whole, in one
+# transaction: its shows are expanded from the recurrence rule, checked
+# against other bookings in one query and inserted in one statement, so
+# either all of them are booked or none. Editing or cancelling a series
+# only touches its upcoming shows; past ones stay as they were.
+
+# conflicting dates listed when a series is refused
+REPORTED_CONFLICTS = 5
+
+
+@app.route("/series/create")
+def create_series():
+    form = SeriesForm()
+    return render_template(
+        "forms/new_series.html",
+        form=form,
+        artists_url="/artists",
+        venues_url="/venues",
+    )
+
+
+@app.route("/series/create", methods=["POST"])
+def create_series_submission():
+    """Creates a series with all its shows, or nothing if any of them
+    overlaps another booking."""
+    form = SeriesForm(meta={"csrf": False})
+    if form.validate_on_submit():
+        error = False
+        series = None
+        refusal = None
+        try:
+            series = ShowSeries(**series_values(form))
+            refusal = missing_reference(series)
+            if not refusal:
+                db.session.add(series)
+                db.session.flush()
+                shows, refusal = schedule(series)
+            if refusal:
+                db.session.rollback()
+            else:
+                db.session.commit()
+                series_id = series.id
+        except ValueError as invalid:
+            # a rule with too many shows
+            refusal = str(invalid)
+            db.session.rollback()
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+        if error:
+            flash("Sorry! Series could not be listed !")
+        elif refusal:
+            flash(refusal)
+        else:
+            cache.shows_created([series.venue_id], [series.artist_id])
+            flash(f"Series was successfully listed with {len(shows)} shows !")
+            return redirect(url_for("show_series", series_id=series_id))
+        return render_template("pages/home.html")
+    else:
+        for field_name, error_msg in form.errors.items():
+            flash("Error in " + field_name + ": " + str(error_msg[0]))
+        return render_template("errors/500.html", url="/series/create"), 500
+
+
+@app.route("/series/<int:series_id>")
+def show_series(series_id):
+    """Shows a series with its upcoming shows; `format=json` for JSON."""
+    series = ShowSeries.query.get(series_id)
+    if not series:
+        return render_template("errors/404.html"), 404
+    venue_name = db.session.query(Venue.name).filter_by(id=series.venue_id).scalar()
+    artist_name = db.session.query(Artist.name).filter_by(id=series.artist_id).scalar()
+    now = datetime.now()
+    upcoming = (
+        db.session.query(Show.id, Show.start_time, Show.end_time)
+        .filter(Show.series_id == series_id, Show.start_time > now)
+        .order_by(Show.start_time)
+        .all()
+    )
+    series_info = {
+        "id": series.id,
+        "venue_id": series.venue_id,
+        "venue_name": venue_name,
+        "artist_id": series.artist_id,
+        "artist_name": artist_name,
+        "start_time": series.start_time,
+        "end_time": series.end_time,
+        "rule": series.rule,
+        "upcoming_shows": [
+            {"id": show.id, "start_time": show.start_time, "end_time": show.end_time}
+            for show in upcoming
+        ],
+    }
+    if wants_json():
+        for show_info in [series_info] + series_info["upcoming_shows"]:
+            show_info["start_time"] = show_info["start_time"].isoformat()
+            show_info["end_time"] = show_info["end_time"].isoformat()
+        return jsonify(series_info)
+    return render_template(
+        "pages/show_series.html", series=series_info, recurrence=rule_fields(series.rule)
+    )
+
+
+@app.route("/series/<int:series_id>/edit", methods=["GET"])
+def edit_series(series_id):
+    form = SeriesForm()
+    series = ShowSeries.query.get(series_id)
+    if series:
+        form.artist_id.data = str(series.artist_id)
+        form.venue_id.data = str(series.venue_id)
+        form.start_time.data = series.start_time
+        form.end_time.data = series.end_time
+        for name, value in rule_fields(series.rule).items():
+            form[name].data = value
+        return render_template("forms/edit_series.html", form=form, series=series)
+    return render_template("errors/404.html"), 404
+
+
+@app.route("/series/<int:series_id>/edit", methods=["POST"])
+def edit_series_submission(series_id):
+    """Reschedules the upcoming shows of a series to the submitted rule,
+    venue and artist, or leaves them as they were if any would overlap
+    another booking."""
+    form = SeriesForm(meta={"csrf": False})
+    if form.validate_on_submit():
+        error = False
+        refusal = None
+        series = ShowSeries.query.get(series_id)
+        if not series:
+            return render_template("errors/404.html"), 404
+        venue_ids, artist_ids = {series.venue_id}, {series.artist_id}
+        try:
+            now = datetime.now()
+            # the series' own shows are freed first, so they cannot conflict
+            cancel_upcoming(series_id, now)
+            for name, value in series_values(form).items():
+                setattr(series, name, value)
+            refusal = missing_reference(series)
+            if not refusal:
+                _, refusal = schedule(series, after=now)
+            if refusal:
+                db.session.rollback()
+            else:
+                venue_ids.add(series.venue_id)
+                artist_ids.add(series.artist_id)
+                db.session.commit()
+        except ValueError as invalid:
+            refusal = str(invalid)
+            db.session.rollback()
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+        if error:
+            flash("Sorry! Series could not be updated !")
+        elif refusal:
+            flash(refusal)
+        else:
+            cache.shows_changed(venue_ids, artist_ids)
+            flash("Series was successfully updated !")
+        return redirect(url_for("show_series", series_id=series_id))
+    else:
+        for field_name, error_msg in form.errors.items():
+            flash("Error in " + field_name + ": " + str(error_msg[0]))
+        return (
+            render_template("errors/500.html", url="/series/<int:series_id>/edit"),
+            500,
+        )
+
+
+@app.route("/series/<int:series_id>", methods=["DELETE"])
+def delete_series(series_id):
+    """Cancels a series: deletes its upcoming shows and the series, whose
+    past shows remain as single shows."""
+    series = ShowSeries.query.get(series_id)
+    if not series:
+        return render_template("errors/404.html"), 404
+    error = False
+    cancelled = []
+    try:
+        venue_id, artist_id = series.venue_id, series.artist_id
+        cancelled = cancel_upcoming(series_id, datetime.now())
+        db.session.delete(series)
+        db.session.commit()
+    except:
+        error = True
+        db.session.rollback()
+        print(sys.exc_info())
+    finally:
+        db.session.close()
+    if error:
+        flash("Error occured. Series could not be cancelled !")
+        return jsonify({"success": False}), 500
+    cache.shows_changed([venue_id], [artist_id])
+    flash(f"Series was cancelled, with its {len(cancelled)} upcoming shows !")
+    return jsonify({"success": True, "cancelled": len(cancelled)})
+
+
+def series_values(form):
+    """The ShowSeries columns submitted with a SeriesForm."""
+    return {
+        "venue_id": int(form.venue_id.data),
+        "artist_id": int(form.artist_id.data),
+        "start_time": form.start_time.data,
+        "end_time": end_time_for(form.start_time.data, form.end_time.data),
+        "rule": recurrence_rule(
+            form.frequency.data, form.interval.data, form.count.data, form.until.data
+        ),
+    }
+
+
+def missing_reference(series):
+    venue_exists, artist_exists = references_exist(series.venue_id, series.artist_id)
+    if not venue_exists:
+        return f"Venue {series.venue_id} does not exist !"
+    if not artist_exists:
+        return f"Artist {series.artist_id} does not exist !"
+    return None
+
+
+def schedule(series, after=None):
+    """Books the shows of `series` (those starting after `after`, if given).
+
+    Returns (inserted shows, None), or (None, why) when one of them would
+    overlap another booking; the caller then rolls back.
+    """
+    periods = occurrences(series.rule, series.start_time, series.end_time)
+    if after is not None:
+        periods = [(start, end) for start, end in periods if start > after]
+    if not periods:
+        return [], None
+    conflicts = series_conflicts(series.venue_id, series.artist_id, periods).all()
+    if conflicts:
+        dates = sorted({conflict.occurrence for conflict in conflicts})
+        listed = ", ".join(format_datetime(date) for date in dates[:REPORTED_CONFLICTS])
+        more = f" and {len(dates) - REPORTED_CONFLICTS} more" if len(dates) > REPORTED_CONFLICTS else ""
+        return None, f"The venue or the artist is already booked on {listed}{more} !"
+    now = datetime.now()
+    rows = [
+        {
+            "venue_id": series.venue_id,
+            "artist_id": series.artist_id,
+            "start_time": start,
+            "end_time": end,
+            "counted_upcoming": counted_upcoming(start, now),
+            "series_id": series.id,
+        }
+        for start, end in periods
+    ]
+    table = Show.__table__
+    shows = db.session.execute(
+        insert(table).values(rows).on_conflict_do_nothing().returning(*table.c)
+    ).fetchall()
+    if len(shows) < len(rows):
+        # booked concurrently since the check
+        return None, "The venue or the artist was booked meanwhile, please try again !"
+    shows_added(shows)
+    return shows, None
+
+
+def cancel_upcoming(series_id, now):
+    """Deletes the shows of a series starting after `now`; returns them."""
+    removed = db.session.execute(
+        Show.__table__.delete()
+        .where(Show.series_id == series_id, Show.start_time > now)
+        .returning(Show.venue_id, Show.artist_id, Show.counted_upcoming)
+    ).fetchall()
+    shows_removed(removed)
+    return removed
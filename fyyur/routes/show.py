@@ -1,30 +1,64 @@
-from fyyur.models import Venue, Artist, Show
-from fyyur import db, app
-from flask import flash, render_template
+from fyyur.models import Show
+from fyyur import db, app, cache, format_datetime
+from flask import request, flash, render_template, jsonify
 from fyyur.forms import ShowForm
+from fyyur.queries import (
+    shows_listing,
+    shows_version,
+    show_conflicts,
+    references_exist,
+    SHOWS_ORDER,
+)
+from fyyur.pagination import keyset_page, pager, wants_json
+from fyyur.counters import counted_upcoming, shows_added
+from fyyur.dedup import insert_new
+from fyyur.scheduling import end_time_for
+from fyyur.utils import datetime_arg
 import sys
 
 #  -------------------------- Shows --------------------------
 
+def listing_version():
+    return shows_version(
+        request.args.get("venue_id", type=int), request.args.get("artist_id", type=int)
+    )
+
+
 @app.route("/shows")
+@cache.versioned_page(listing_version)
+@cache.cached_page
 def shows():
-    """Displays all shows in chronological order."""
-    all_shows = Show.query.join(Venue).join(Artist).order_by(Show.start_time).all()
+    """Displays all shows in chronological order.
+
+    Optional filters: `from`/`to` (datetime window), `venue_id`, `artist_id`.
+    Paginated by `cursor`; `format=json` returns the page as JSON.
+    """
+    query = shows_listing(
+        start=datetime_arg("from"),
+        end=datetime_arg("to"),
+        venue_id=request.args.get("venue_id", type=int),
+        artist_id=request.args.get("artist_id", type=int),
+    )
+    rows, next_cursor = keyset_page(query, SHOWS_ORDER, request.args.get("cursor"))
     data = []
-    for show in all_shows:
+    for row in rows:
         show_info = {
-            "venue_id": show.venue_id,
-            "venue_name": Venue.query.filter_by(id=show.venue_id).first().name,
-            "artist_id": show.artist_id,
-            "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-            "artist_image_link": Artist.query.filter_by(id=show.artist_id)
-            .first()
-            .image_link,
-            "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.artist_image_link,
+            "start_time": row.start_time,
+            "end_time": row.end_time,
         }
         data.append(show_info)
 
-    return render_template("pages/shows.html", shows=data)
+    if wants_json():
+        for show_info in data:
+            show_info["start_time"] = show_info["start_time"].isoformat()
+            show_info["end_time"] = show_info["end_time"].isoformat()
+        return jsonify({"data": data, "next_cursor": next_cursor})
+    return render_template("pages/shows.html", shows=data, pager=pager(next_cursor))
 
 
 @app.route("/shows/create")
@@ -47,19 +81,25 @@ def create_show_submission():
     form = ShowForm(meta={"csrf": False})
     if form.validate_on_submit():
         error = False
-        show = Show.query.filter(
-            Show.artist_id == form.artist_id.data,
-            Show.venue_id == form.venue_id.data,
-            Show.start_time == form.start_time.data,
-        ).first()
-        if show:
-            flash("You cannot add the same show twice !")
-            return render_template("pages/home.html")
+        show = None
+        refusal = None
         try:
-            new_show = Show()
-            for field in form:
-                setattr(new_show, field.name, field.data)
-            db.session.add(new_show)
+            values = {field.name: field.data for field in form}
+            venue_id, artist_id = int(values["venue_id"]), int(values["artist_id"])
+            values["end_time"] = end_time_for(values["start_time"], values["end_time"])
+            venue_exists, artist_exists = references_exist(venue_id, artist_id)
+            if not venue_exists:
+                refusal = f"Venue {venue_id} does not exist !"
+            elif not artist_exists:
+                refusal = f"Artist {artist_id} does not exist !"
+            else:
+                values["counted_upcoming"] = counted_upcoming(form.start_time.data)
+                # a duplicate or double booking inserts nothing
+                show = insert_new(Show, values)
+                if show:
+                    shows_added([show])
+                else:
+                    refusal = booking_refusal(values)
             db.session.commit()
         except:
             error = True
@@ -67,12 +107,34 @@ def create_show_submission():
             print(sys.exc_info())
         finally:
             db.session.close()
-        if not error:
-            flash("Show was successfully listed !")
-        else:
+        if error:
             flash("Sorry! Show could not be listed !")
+        elif refusal:
+            flash(refusal)
+        else:
+            cache.show_created(show.venue_id, show.artist_id)
+            flash("Show was successfully listed !")
         return render_template("pages/home.html")
     else:
         for field_name, error_msg in form.errors.items():
             flash("Error in " + field_name + ": " + str(error_msg[0]))
         return render_template("errors/500.html", url="/shows/create"), 500
+
+
+def booking_refusal(values):
+    """Why the show of `values` was not inserted: the show it duplicates or
+    the first one it overlaps at the venue or of the artist."""
+    venue_id, artist_id = int(values["venue_id"]), int(values["artist_id"])
+    other = show_conflicts(
+        venue_id, artist_id, values["start_time"], values["end_time"]
+    ).first()
+    if other is None or (
+        (other.venue_id, other.artist_id, other.start_time)
+        == (venue_id, artist_id, values["start_time"])
+    ):
+        return "You cannot add the same show twice !"
+    booked = "The venue" if other.venue_id == venue_id else "The artist"
+    return (
+        f"{booked} is already booked from {format_datetime(other.start_time)}"
+        f" to {format_datetime(other.end_time)} !"
+    )
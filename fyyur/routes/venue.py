@@ -1,91 +1,162 @@
 from fyyur.models import Venue, Show, Artist
 from fyyur.forms import VenueForm
-from datetime import datetime
-from flask import render_template, request, flash, redirect, url_for, jsonify
+from fyyur.queries import (
+    venues_listing,
+    venue_shows,
+    venue_calendar,
+    venue_version,
+    VENUES_ORDER,
+    SHOWS_ORDER,
+    UPCOMING_SHOWS_LIMIT,
+    PAST_SHOWS_PAGE_SIZE,
+    CALENDAR_DAYS,
+    MAX_CALENDAR_DAYS,
+)
+from fyyur.pagination import keyset_page, pager, wants_json
+from fyyur import search, cache, browse, feeds
+from fyyur.counters import release_venue_shows
+from fyyur.dedup import insert_new
+from fyyur.utils import ids_arg, datetime_arg
+from datetime import datetime, timedelta
+from itertools import groupby
+from flask import render_template, request, flash, redirect, url_for, jsonify, abort
 from fyyur import app, db
 import sys
 
 #  -------------------------- Venues --------------------------
 
 @app.route("/venues")
+@cache.cached_page
 def venues():
-    """Shows all venues, grouped by areas(city&state)."""
-    # use "with_entities()" method to limit the columns to be returned
-    areas = (
-        Venue.query.with_entities(Venue.city, Venue.state)
-        .group_by(Venue.city, Venue.state)
-        .all()
+    """Shows all venues, grouped by areas(city&state).
+
+    Paginated by `cursor`; `format=json` returns the page as JSON.
+    """
+    # one ordered result set, split into areas as it is read
+    rows, next_cursor = keyset_page(
+        venues_listing(), VENUES_ORDER, request.args.get("cursor")
     )
     data = []
-    for area in areas:
-        venues_in_area = Venue.query.filter_by(city=area.city, state=area.state).all()
+    for (city, state), venues_in_area in groupby(rows, key=lambda row: (row.city, row.state)):
         venues_info = []
         for venue in venues_in_area:
             venue_info = {
                 "id": venue.id,
                 "name": venue.name,
-                "num_upcoming_shows": len(
-                    Show.query.filter(Show.venue_id == venue.id)
-                    .filter(Show.start_time > datetime.now())
-                    .all()
-                ),
+                "num_upcoming_shows": venue.num_upcoming_shows,
             }
             venues_info.append(venue_info)
-        area_info = {"city": area.city, "state": area.state, "venues": venues_info}
+        area_info = {"city": city, "state": state, "venues": venues_info}
         data.append(area_info)
 
-    return render_template("pages/venues.html", areas=data)
+    if wants_json():
+        return jsonify({"data": data, "next_cursor": next_cursor})
+    return render_template("pages/venues.html", areas=data, pager=pager(next_cursor))
+
+
+@app.route("/venues/browse")
+@cache.cached_page
+def browse_venues():
+    """Browses venues by genre, state, city and seeking talent, with facet counts.
+
+    Paginated by `cursor`; `format=json` returns the page and facets as JSON.
+    """
+    filters = browse.parse_filters(request.args)
+    rows, next_cursor = keyset_page(
+        browse.filtered(Venue, browse.browse_listing(Venue), filters),
+        VENUES_ORDER,
+        request.args.get("cursor"),
+    )
+    total, facets = browse.facet_counts(Venue, filters)
+    data = []
+    for venue in rows:
+        venue_info = {
+            "id": venue.id,
+            "name": venue.name,
+            "city": venue.city,
+            "state": venue.state,
+            "genres": venue.genres,
+        }
+        data.append(venue_info)
+
+    if wants_json():
+        return jsonify(
+            {"data": data, "next_cursor": next_cursor, "total": total, "facets": facets}
+        )
+    return render_template(
+        "pages/browse.html",
+        kind="venues",
+        results=data,
+        total=total,
+        facets=browse.facet_links(facets, filters),
+        pager=pager(next_cursor),
+    )
 
 
-@app.route("/venues/search", methods=["POST"])
+@app.route("/venues/search", methods=["GET", "POST"])
 def search_venues():
-    """Search venues with partial string search, case-insensitive."""
-    user_input = request.form.get("search_term", "")
-    candidates = Venue.query.filter(Venue.name.ilike(f"%{user_input}%"))
+    """Search venues by name, city, state or genre, ranked and paginated."""
+    user_input = request.values.get("search_term", "")
+    page = request.values.get("page", 1, type=int)
+    rows, total = search.search_venues(user_input, page=page)
     data = []
-    count = 0
-    for candidate in candidates:
-        count += 1
+    for candidate in rows:
         candidate_info = {
             "id": candidate.id,
             "name": candidate.name,
-            "num_upcoming_shows": len(
-                Show.query.filter(Show.venue_id == candidate.id)
-                .filter(Show.start_time > datetime.now())
-                .all()
-            ),
+            "num_upcoming_shows": candidate.num_upcoming_shows,
         }
         data.append(candidate_info)
-    response = {"count": count, "data": data}
+    response = {
+        "count": total,
+        "data": data,
+        "page": page,
+        "pages": search.page_count(total),
+    }
 
     return render_template(
         "pages/search_venues.html",
         results=response,
-        search_term=request.form.get("search_term", ""),
+        search_term=user_input,
     )
 
 
 @app.route("/venues/<int:venue_id>")
+@cache.versioned_page(venue_version)
+@cache.cached_page
 def show_venue(venue_id):
-    """Shows the specific venue's page."""
-    print('enter--------------------------')
+    """Shows the specific venue's page.
+
+    Lists the next upcoming shows and one page of past shows, most recent
+    first, paginated by `past_cursor`. Counts come from the venue's counters.
+    """
     venue = Venue.query.get(venue_id)
+    if not venue:
+        return render_template("errors/404.html"), 404
+    now = datetime.now()
+    upcoming, more_upcoming = keyset_page(
+        venue_shows(venue_id).filter(Show.start_time > now),
+        SHOWS_ORDER,
+        per_page=UPCOMING_SHOWS_LIMIT,
+    )
+    past, next_past_cursor = keyset_page(
+        venue_shows(venue_id).filter(Show.start_time <= now),
+        SHOWS_ORDER,
+        request.args.get("past_cursor"),
+        per_page=PAST_SHOWS_PAGE_SIZE,
+        descending=True,
+    )
     past_shows = []
     upcoming_shows = []
-    print(len(venue.shows))
-    if venue.shows:
-        for show in venue.shows:
-            artist = Artist.query.filter_by(id=show.artist_id).first()
+    for shows, rows in ((upcoming_shows, upcoming), (past_shows, past)):
+        for show in rows:
             show_info = {
-                "artist_id": artist.id,
-                "artist_name": artist.name,
-                "artist_image_link": artist.image_link,
-                "start_time": show.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time,
             }
-            if str(show_info["start_time"]) < str(datetime.now()):
-                past_shows.append(show_info)
-            else:
-                upcoming_shows.append(show_info)
+            shows.append(show_info)
     venue_info = {
         "id": venue.id,
         "name": venue.name,
@@ -101,11 +172,85 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows_count": venue.past_shows_count,
+        "upcoming_shows_count": venue.upcoming_shows_count,
+        # the listing pages through all of them
+        "all_upcoming_url": url_for(
+            "shows", venue_id=venue_id, **{"from": now.isoformat(timespec="minutes")}
+        )
+        if more_upcoming
+        else None,
     }
 
-    return render_template("pages/show_venue.html", venue=venue_info)
+    return render_template(
+        "pages/show_venue.html",
+        venue=venue_info,
+        pager=pager(next_past_cursor, "past_cursor"),
+    )
+
+
+@app.route("/venues/<int:venue_id>/availability")
+@cache.cached_page
+def venue_availability(venue_id):
+    """Shows a venue's bookings and the free periods between them.
+
+    The window is `from`/`to`, by default the week starting today, at most
+    MAX_CALENDAR_DAYS long; `format=json` returns it as JSON.
+    """
+    venue_name = db.session.query(Venue.name).filter_by(id=venue_id).scalar()
+    if venue_name is None:
+        return render_template("errors/404.html"), 404
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = datetime_arg("from") or today
+    end = datetime_arg("to") or start + timedelta(days=CALENDAR_DAYS)
+    if end <= start:
+        abort(400, description="'to' should be after 'from'")
+    if end - start > timedelta(days=MAX_CALENDAR_DAYS):
+        abort(400, description=f"At most {MAX_CALENDAR_DAYS} days at a time.")
+    data = []
+    for period in venue_calendar(venue_id, start, end):
+        period_info = {
+            "free": period.show_id is None,
+            "show_id": period.show_id,
+            "artist_id": period.artist_id,
+            "artist_name": period.artist_name,
+            "start_time": period.start_time,
+            "end_time": period.end_time,
+        }
+        data.append(period_info)
+
+    if wants_json():
+        for period_info in data:
+            period_info["start_time"] = period_info["start_time"].isoformat()
+            period_info["end_time"] = period_info["end_time"].isoformat()
+        return jsonify(
+            {
+                "venue_id": venue_id,
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "data": data,
+            }
+        )
+    days = [
+        (day, list(periods))
+        for day, periods in groupby(data, key=lambda period: period["start_time"].date())
+    ]
+    window = end - start
+    return render_template(
+        "pages/venue_availability.html",
+        venue={"id": venue_id, "name": venue_name},
+        start=start,
+        end=end,
+        days=days,
+        previous_url=url_for(
+            "venue_availability", venue_id=venue_id,
+            **{"from": (start - window).isoformat(), "to": start.isoformat()}
+        ),
+        next_url=url_for(
+            "venue_availability", venue_id=venue_id,
+            **{"from": end.isoformat(), "to": (end + window).isoformat()}
+        ),
+    )
 
 
 @app.route("/venues/create", methods=["GET"])
@@ -121,25 +266,10 @@ def create_venue_submission():
     # avoid nonsensical creation
     if form.validate_on_submit():
         error = False
-        # avoid duplicated creation
-        venue = Venue.query.filter(
-            Venue.name == form.name.data,
-            Venue.city == form.city.data,
-            Venue.state == form.state.data,
-            Venue.address == form.address.data,
-            Venue.phone == form.phone.data,
-        ).first()
-        if venue:
-            flash(
-                form.name.data
-                + " has already exited. You cannot add the same venue twice !"
-            )
-            return render_template("pages/home.html")
+        venue = None
         try:
-            new_venue = Venue()
-            for field in form:
-                setattr(new_venue, field.name, field.data)
-            db.session.add(new_venue)
+            # avoid duplicated creation: a duplicate inserts nothing
+            venue = insert_new(Venue, {field.name: field.data for field in form})
             db.session.commit()
         except:
             error = True
@@ -147,11 +277,17 @@ def create_venue_submission():
             print(sys.exc_info())
         finally:
             db.session.close()
-        if not error:
+        if error:
+            flash("Sorry, " + request.form["name"] + " could not be listed !")
+        elif venue is None:
+            flash(
+                form.name.data
+                + " has already exited. You cannot add the same venue twice !"
+            )
+        else:
+            cache.venue_created()
             # give feedback to users with the flashing system
             flash(request.form["name"] + " was successfully listed !")
-        else:
-            flash("Sorry, " + request.form["name"] + " could not be listed !")
         return render_template("pages/home.html")
     else:
         for field_name, error_msg in form.errors.items():
@@ -178,8 +314,15 @@ def edit_venue_submission(venue_id):
         error = False
         venue = Venue.query.get(venue_id)
         try:
+            # artist pages show the venue's name and image with its shows
+            renamed = (venue.name, venue.image_link) != (form.name.data, form.image_link.data)
+            artist_ids = cache.venue_artists(venue_id) if renamed else ()
             for field in form:
                 setattr(venue, field.name, field.data)
+            if renamed:
+                # feeds list the names of both
+                feeds.touch(Venue, [venue_id])
+                feeds.touch(Artist, artist_ids)
             db.session.commit()
         except:
             error = True
@@ -188,6 +331,7 @@ def edit_venue_submission(venue_id):
         finally:
             db.session.close()
         if not error:
+            cache.venue_changed(venue_id, artist_ids)
             # give feedback to users with the flashing system
             flash(request.form["name"] + " was successfully updated!")
         else:
@@ -209,7 +353,8 @@ def delete_venue(venue_id):
     try:
         venue = Venue.query.get(venue_id)
         venue_name = venue.name
-        print('delete successfully')
+        # the artists whose counters change are those listing its shows
+        artist_ids = release_venue_shows([venue_id])
         db.session.delete(venue)
         db.session.commit()
     except:
@@ -219,7 +364,38 @@ def delete_venue(venue_id):
     finally:
         db.session.close()
     if not error:
+        cache.venue_changed(venue_id, artist_ids)
         flash(venue_name + " was successfully deleted !")
     else:
         flash("Error occured. " + venue_name + " could not be deleted !")
     return jsonify({'success': True})
+
+
+@app.route("/venues", methods=["DELETE"])
+def delete_venues():
+    """Deletes the venues whose ids are given, see `ids_arg`, in one transaction.
+
+    Their shows go with them through the foreign keys' ON DELETE CASCADE.
+    """
+    venue_ids = ids_arg()
+    error = False
+    deleted = []
+    try:
+        artist_ids = release_venue_shows(venue_ids)
+        result = db.session.execute(
+            Venue.__table__.delete()
+            .where(Venue.id.in_(venue_ids))
+            .returning(Venue.id)
+        )
+        deleted = [row.id for row in result]
+        db.session.commit()
+    except:
+        error = True
+        db.session.rollback()
+        print(sys.exc_info())
+    finally:
+        db.session.close()
+    if error:
+        return jsonify({"success": False}), 500
+    cache.venues_changed(deleted, artist_ids)
+    return jsonify({"success": True, "deleted": deleted})
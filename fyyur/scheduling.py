@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from itertools import islice
+from dateutil.rrule import rrulestr
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
+# ----------------------------------------------------------------------------#
+#                              Show scheduling.
+# ----------------------------------------------------------------------------#
+# A show books its venue and its artist over [start_time, end_time). Two
+# exclusion constraints (see models.py) reject a show overlapping another
+# one at the same venue, or of the same artist, each checked by a probe of
+# its GiST index. The ids are compared as single-value ranges so the
+# indexes need only the built-in range operator classes, not btree_gist.
+#
+# Inserts use ON CONFLICT DO NOTHING, which covers exclusion constraints
+# as well, so an overlapping show is a single statement inserting nothing;
+# fyyur.queries.show_conflicts then finds what it overlaps, from the same
+# indexes.
+#
+# A series books the same venue and artist on a recurrence rule, a subset
+# of the RFC 5545 RRULE (FREQ, INTERVAL, and COUNT or UNTIL), for example
+# "FREQ=WEEKLY;COUNT=52". Its shows are expanded from the rule here and
+# written together, see fyyur/routes/series.py.
+
+# used when a show is given no end time
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+MAX_SHOW_DURATION = timedelta(hours=24)
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+MAX_SERIES_SHOWS = 366
+
+
+def slot(entity_id):
+    """`entity_id` as a range, the form the exclusion constraints compare."""
+    # a literal, as constraint DDL renders no bound parameters
+    return func.int4range(entity_id, entity_id, literal_column("'[]'"))
+
+
+def period(start_time, end_time):
+    return func.tsrange(start_time, end_time)
+
+
+def double_booking_constraint(name, c, id_column):
+    """Rejects rows of `c` sharing `id_column` with overlapping periods."""
+    return ExcludeConstraint(
+        (slot(c[id_column]), "="),
+        (period(c.start_time, c.end_time), "&&"),
+        name=name,
+        using="gist",
+    )
+
+
+def end_time_for(start_time, end_time):
+    return end_time or start_time + DEFAULT_SHOW_DURATION
+
+
+def duration_error(start_time, end_time):
+    """Why a show cannot run from `start_time` to `end_time`, or None."""
+    if start_time is None or end_time is None:
+        return None
+    if end_time <= start_time:
+        return "End time should be after the start time !"
+    if end_time - start_time > MAX_SHOW_DURATION:
+        return f"A show should last at most {MAX_SHOW_DURATION.total_seconds() // 3600:.0f} hours !"
+    return None
+
+
+def recurrence_rule(frequency, interval=1, count=None, until=None):
+    """The RRULE of a series; ends after `count` shows or at `until`."""
+    parts = [f"FREQ={frequency}", f"INTERVAL={interval}"]
+    if count:
+        parts.append(f"COUNT={count}")
+    if until:
+        parts.append(f"UNTIL={until:%Y%m%dT%H%M%S}")
+    return ";".join(parts)
+
+
+def rule_fields(rule):
+    """The frequency, interval, count and until a rule was made of."""
+    parts = dict(part.split("=", 1) for part in rule.split(";"))
+    until = parts.get("UNTIL")
+    return {
+        "frequency": parts["FREQ"],
+        "interval": int(parts.get("INTERVAL", 1)),
+        "count": int(parts["COUNT"]) if "COUNT" in parts else None,
+        "until": datetime.strptime(until, "%Y%m%dT%H%M%S") if until else None,
+    }
+
+
+def occurrences(rule, start_time, end_time):
+    """The (start_time, end_time) of each show of a series, the first one
+    running from `start_time` to `end_time`.
+
+    Raises ValueError for a malformed rule or more than MAX_SERIES_SHOWS shows.
+    """
+    starts = list(islice(rrulestr(rule, dtstart=start_time), MAX_SERIES_SHOWS + 1))
+    if len(starts) > MAX_SERIES_SHOWS:
+        raise ValueError(f"A series should have at most {MAX_SERIES_SHOWS} shows !")
+    duration = end_time - start_time
+    return [(start, start + duration) for start in starts]
@@ -0,0 +1,97 @@
+from fyyur import db
+from fyyur.models import Venue, Artist, search_document
+import re
+
+# ----------------------------------------------------------------------------#
+#                                  Search.
+# ----------------------------------------------------------------------------#
+# Matching is served by the indexes declared in models.py: a pg_trgm GIN
+# index on `name` (backs the ILIKE substring match) and a GIN index on
+# fyyur_search_document(name, city, state, genres) (backs the prefix
+# full-text match). Results are ranked and paginated, never unbounded.
+#
+# Ranking reads every match, so terms too short to narrow the matches
+# down (trigrams need three characters) are not searched, and pages stop
+# at MAX_SEARCH_PAGES, past which a more precise term is the way on.
+
+SEARCH_PAGE_SIZE = 20
+MIN_TERM_LENGTH = 3
+MAX_SEARCH_PAGES = 25
+
+
+def _escape_like(term):
+    return re.sub(r"([\\%_])", r"\\\1", term)
+
+
+def _prefix_tsquery(term):
+    """Turns free text into a tsquery where every word is a prefix match."""
+    words = re.findall(r"\w+", term.lower())
+    return " & ".join(word + ":*" for word in words)
+
+
+def _search_query(model, kind, term):
+    document = search_document(model)
+    condition = model.name.ilike("%" + _escape_like(term) + "%", escape="\\")
+    rank = db.func.similarity(model.name, term)
+    tsquery = _prefix_tsquery(term)
+    if tsquery:
+        tsquery = db.func.to_tsquery("simple", tsquery)
+        condition = db.or_(condition, document.op("@@")(tsquery))
+        rank = rank + db.func.ts_rank(document, tsquery)
+    return db.session.query(
+        db.literal(kind).label("kind"),
+        model.id.label("id"),
+        model.name.label("name"),
+        model.city.label("city"),
+        model.state.label("state"),
+        model.upcoming_shows_count.label("num_upcoming_shows"),
+        rank.label("rank"),
+    ).filter(condition)
+
+
+def searchable(term):
+    return len(term.strip()) >= MIN_TERM_LENGTH
+
+
+def page_count(total, per_page=SEARCH_PAGE_SIZE):
+    """How many pages of `total` results are served."""
+    return min(-(-total // per_page), MAX_SEARCH_PAGES)
+
+
+def _paginate(query, page, per_page):
+    """Orders by rank and returns (rows, total) for one page in a single query."""
+    if page > MAX_SEARCH_PAGES:
+        return [], 0
+    matches = query.subquery()
+    rows = (
+        db.session.query(matches, db.func.count().over().label("total"))
+        .order_by(matches.c.rank.desc(), matches.c.name, matches.c.id)
+        .limit(per_page)
+        .offset((max(page, 1) - 1) * per_page)
+        .all()
+    )
+    return rows, rows[0].total if rows else 0
+
+
+def search_venues(term, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked venue matches on name, city, state and genres."""
+    if not searchable(term):
+        return [], 0
+    return _paginate(_search_query(Venue, "venue", term), page, per_page)
+
+
+def search_artists(term, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked artist matches on name, city, state and genres."""
+    if not searchable(term):
+        return [], 0
+    return _paginate(_search_query(Artist, "artist", term), page, per_page)
+
+
+def search_all(term, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Ranked venue and artist matches, interleaved by rank."""
+    if not searchable(term):
+        return [], 0
+    query = _search_query(Venue, "venue", term).union_all(
+        _search_query(Artist, "artist", term)
+    )
+    return _paginate(query, page, per_page)
@@ -0,0 +1,151 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from fyyur import db, counters
+from fyyur.enums import Genre
+from fyyur.models import Venue, Artist, Show
+
+# ----------------------------------------------------------------------------#
+#                            Synthetic dataset.
+# ----------------------------------------------------------------------------#
+# One unit of scale is 100 venues, 300 artists and 2,000 shows. Shows pick
+# venues and artists from a Zipf distribution of exponent `skew`, so a few
+# hot venues and prolific artists hold most of the shows, as in real data.
+# A venue or artist has at most one show an evening, so no show overlaps
+# another (see fyyur.scheduling); at large scales the hottest fill up.
+
+VENUES_PER_SCALE = 100
+ARTISTS_PER_SCALE = 300
+SHOWS_PER_SCALE = 2000
+CHUNK_SIZE = 5000
+
+AREAS = [
+    ("San Francisco", "CA"), ("Los Angeles", "CA"), ("Oakland", "CA"),
+    ("New York", "NY"), ("Brooklyn", "NY"), ("Chicago", "IL"),
+    ("Austin", "TX"), ("Houston", "TX"), ("Seattle", "WA"),
+    ("Portland", "OR"), ("Nashville", "TN"), ("New Orleans", "LA"),
+    ("Boston", "MA"), ("Denver", "CO"), ("Atlanta", "GA"), ("Miami", "FL"),
+]
+ADJECTIVES = [
+    "Blue", "Golden", "Velvet", "Electric", "Crimson", "Silver", "Midnight",
+    "Rusty", "Dueling", "Wild", "Lucky", "Hidden", "Neon", "Broken", "Royal",
+]
+NOUNS = [
+    "Moon", "Room", "Cellar", "Garden", "Lounge", "Hall", "Pianos", "Owl",
+    "Anchor", "Tiger", "Lantern", "Harbor", "Fox", "Engine", "Orchard",
+]
+VENUE_KINDS = ["Club", "Bar", "Theatre", "Social Club", "Music Hall", "Tavern"]
+ARTIST_KINDS = ["Band", "Trio", "Collective", "Quartet", "Orchestra", "Project"]
+STREETS = ["Main St", "Market St", "Broadway", "2nd Ave", "Oak St", "Mission St"]
+SHOW_HOURS = (18, 19, 20, 21, 22)
+SHOW_MINUTES = (60, 90, 120, 180)
+
+
+def _phone(rng):
+    return f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"
+
+
+def _genres(rng):
+    return rng.sample([genre.name for genre in Genre], rng.randint(1, 3))
+
+
+def _name(rng, kinds, number):
+    return f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(kinds)} {number}"
+
+
+def _zipf_weights(n, skew):
+    return list(accumulate(1 / rank ** skew for rank in range(1, n + 1)))
+
+
+def _insert(model, rows):
+    """Bulk-inserts `rows` in executemany chunks and returns their new ids."""
+    before = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(model.__table__.insert(), rows[start:start + CHUNK_SIZE])
+    return [
+        row.id
+        for row in db.session.query(model.id).filter(model.id > before).order_by(model.id)
+    ]
+
+
+def venue_rows(rng, count):
+    rows = []
+    for number in range(count):
+        city, state = rng.choice(AREAS)
+        rows.append({
+            "name": _name(rng, VENUE_KINDS, number),
+            "city": city,
+            "state": state,
+            "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+            "phone": _phone(rng),
+            "genres": _genres(rng),
+            "facebook_link": f"https://www.facebook.com/venue{number}",
+            "image_link": f"https://picsum.photos/seed/venue{number}/400/300",
+            "website_link": f"https://venue{number}.example.com",
+            "seeking_talent": rng.random() < 0.4,
+            "seeking_description": "We are looking for local acts.",
+        })
+    return rows
+
+
+def artist_rows(rng, count):
+    rows = []
+    for number in range(count):
+        city, state = rng.choice(AREAS)
+        rows.append({
+            "name": _name(rng, ARTIST_KINDS, number),
+            "city": city,
+            "state": state,
+            "phone": _phone(rng),
+            "genres": _genres(rng),
+            "facebook_link": f"https://www.facebook.com/artist{number}",
+            "image_link": f"https://picsum.photos/seed/artist{number}/400/300",
+            "website_link": f"https://artist{number}.example.com",
+            "seeking_venue": rng.random() < 0.5,
+            "seeking_description": "Looking for shows in the area.",
+        })
+    return rows
+
+
+def show_rows(rng, count, venue_ids, artist_ids, skew, now):
+    """Shows over the two years before and the year after `now`."""
+    venue_weights = _zipf_weights(len(venue_ids), skew)
+    artist_weights = _zipf_weights(len(artist_ids), skew)
+    first_day = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=730)
+    rows, venue_days, artist_days = [], set(), set()
+    while len(rows) < count:
+        venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+        artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+        day = rng.randrange(1095)
+        if (venue_id, day) in venue_days or (artist_id, day) in artist_days:
+            continue
+        venue_days.add((venue_id, day))
+        artist_days.add((artist_id, day))
+        start_time = first_day + timedelta(days=day, hours=rng.choice(SHOW_HOURS))
+        rows.append({
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "start_time": start_time,
+            "end_time": start_time + timedelta(minutes=rng.choice(SHOW_MINUTES)),
+            "counted_upcoming": start_time > now,
+        })
+    return rows
+
+
+def seed(scale, skew=1.1, seed=None):
+    """Generates `scale` units of venues, artists and shows in one transaction.
+
+    Returns the number of (venues, artists, shows) created.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    venue_ids = _insert(Venue, venue_rows(rng, VENUES_PER_SCALE * scale))
+    artist_ids = _insert(Artist, artist_rows(rng, ARTISTS_PER_SCALE * scale))
+    shows = show_rows(rng, SHOWS_PER_SCALE * scale, venue_ids, artist_ids, skew, now)
+    for start in range(0, len(shows), CHUNK_SIZE):
+        db.session.execute(Show.__table__.insert(), shows[start:start + CHUNK_SIZE])
+    # the rows above carry their counted_upcoming flag, so rewriting the
+    # drifted counters from the flags brings every counter up to date
+    counters.verify(repair=True, now=now)
+    db.session.commit()
+    return len(venue_ids), len(artist_ids), len(shows)
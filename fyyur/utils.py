@@ -0,0 +1,41 @@
+import dateutil.parser
+from flask import request, abort
+
+# ----------------------------------------------------------------------------#
+#                                 Helpers.
+# ----------------------------------------------------------------------------#
+
+def datetime_arg(name):
+    """Parses the `name` query argument as a naive local datetime, like the
+    stored show times, aborting with 400 if invalid."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = dateutil.parser.parse(value)
+    except (ValueError, OverflowError):
+        abort(400, description=f"Invalid datetime for '{name}': {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+MAX_BULK_IDS = 1000
+
+
+def ids_arg():
+    """The ids of a bulk request, from a JSON body {"ids": [...]} or else
+    repeated or comma-separated `ids` arguments; aborts with 400 if invalid."""
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        values = body.get("ids")
+    else:
+        values = [v for arg in request.values.getlist("ids") for v in arg.split(",") if v]
+    if not isinstance(values, list) or not values:
+        abort(400, description="Expected a non-empty list of ids.")
+    if len(values) > MAX_BULK_IDS:
+        abort(400, description=f"At most {MAX_BULK_IDS} ids per request.")
+    try:
+        return sorted({int(value) for value in values if not isinstance(value, bool)})
+    except (TypeError, ValueError):
+        abort(400, description="Ids must be integers.")
@@ -1,3 +1,9 @@
+import os
+
+if __name__ == "__main__":
+    # the development server; WSGI servers import app in production
+    os.environ.setdefault("FLASK_ENV", "development")
+
 from fyyur import app
 
 # Default port:
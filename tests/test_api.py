@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from fyyur.models import Venue
+from fyyur.queries import VENUES_ORDER
+from fyyur.routes.api import (
+    DEFAULT_VENUE_FIELDS, VENUE_FIELDS, project, selected_fields, serialize,
+)
+
+
+def test_default_fields_without_a_fields_arg(app):
+    with app.test_request_context("/api/v1/venues"):
+        assert selected_fields(VENUE_FIELDS, DEFAULT_VENUE_FIELDS) == list(DEFAULT_VENUE_FIELDS)
+
+
+def test_fields_keep_their_order_once(app):
+    with app.test_request_context("/api/v1/venues?fields=name, id,name,"):
+        assert selected_fields(VENUE_FIELDS, DEFAULT_VENUE_FIELDS) == ["name", "id"]
+
+
+@pytest.mark.parametrize("fields", ["id,password", ","])
+def test_unknown_fields_are_a_400(app, fields):
+    with app.test_request_context(f"/api/v1/venues?fields={fields}"), pytest.raises(BadRequest):
+        selected_fields(VENUE_FIELDS, DEFAULT_VENUE_FIELDS)
+
+
+def test_only_selected_columns_and_sort_keys_are_queried(app):
+    with app.app_context():
+        query = project(VENUE_FIELDS, ["id", "phone"], VENUES_ORDER)
+    # the sort keys not asked for follow the fields
+    assert [column.name for column in query.statement.selected_columns] == [
+        "id", "phone", "state", "city", "name"
+    ]
+
+
+def test_serialize_drops_trailing_sort_keys():
+    rows = [(1, datetime(2030, 1, 1, 20, 30), "CA", "San Francisco")]
+    assert serialize(rows, ["id", "created_at"]) == [
+        {"id": 1, "created_at": "2030-01-01T20:30:00"}
+    ]
+
+
+def test_listing_returns_only_the_selected_fields(app, session):
+    venue = Venue(
+        name="Projected Venue", city="San Francisco", state="CA",
+        address="1 Test St", phone="123-123-1234", genres=["Jazz"],
+    )
+    session.add(venue)
+    session.flush()
+    client = app.test_client()
+    response = client.get(f"/api/v1/venues/{venue.id}?fields=name,genres")
+    assert response.get_json() == {"data": {"name": "Projected Venue", "genres": ["Jazz"]}}
+    etag = response.headers["ETag"]
+    response = client.get(f"/api/v1/venues/{venue.id}?fields=name,genres", headers={"If-None-Match": etag})
+    assert response.status_code == 304
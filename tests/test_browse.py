@@ -0,0 +1,75 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import BadRequest
+
+from fyyur import browse
+from fyyur.models import Venue
+
+
+def test_filters_accept_genre_names_and_labels():
+    args = MultiDict([("genre", "Hip-Hop"), ("genre", "Jazz"), ("genre", "Hip_Hop"),
+                      ("state", "CA"), ("city", ""), ("seeking", "false")])
+    assert browse.parse_filters(args) == {
+        "genre": ["Hip_Hop", "Jazz"], "state": "CA", "seeking": False
+    }
+
+
+@pytest.mark.parametrize("args", [{"genre": "Polka"}, {"state": "ZZ"}, {"seeking": "yes"}])
+def test_unknown_filter_values_are_a_400(args):
+    with pytest.raises(BadRequest):
+        browse.parse_filters(MultiDict(args))
+
+
+def test_facet_links_toggle_their_value(app):
+    filters = {"genre": ["Jazz"], "state": "CA"}
+    facets = {
+        "genre": [{"value": "Jazz"}, {"value": "Blues"}],
+        "state": [{"value": "CA"}, {"value": "NY"}],
+        "city": [],
+        "seeking": [{"value": True}],
+    }
+    with app.test_request_context("/venues/browse?genre=Jazz&state=CA&page=3"):
+        browse.facet_links(facets, filters)
+
+    def args(facet):
+        url = urlsplit(facet["url"])
+        assert url.path == "/venues/browse"
+        return parse_qs(url.query)
+
+    jazz, blues = facets["genre"]
+    assert jazz["selected"] and args(jazz) == {"state": ["CA"]}
+    assert not blues["selected"] and args(blues) == {"genre": ["Blues", "Jazz"], "state": ["CA"]}
+    ca, ny = facets["state"]
+    assert ca["selected"] and args(ca) == {"genre": ["Jazz"]}
+    assert args(ny) == {"genre": ["Jazz"], "state": ["NY"]}
+    assert args(facets["seeking"][0])["seeking"] == ["true"]
+
+
+def add_venue(session, name, genres, seeking):
+    session.add(Venue(
+        name=name, city="Facetville", state="CA", address="1 Test St",
+        phone="123-123-1234", genres=genres, seeking_talent=seeking,
+    ))
+
+
+def test_facets_count_each_venue_once_per_dimension(session):
+    add_venue(session, "Faceted Club", ["Jazz", "Blues"], True)
+    add_venue(session, "Faceted Hall", ["Jazz"], False)
+    add_venue(session, "Faceted Room", [], None)
+    session.flush()
+    total, facets = browse.facet_counts(Venue, {"city": "Facetville"})
+
+    def counts(name):
+        return [(facet["label"], facet["count"]) for facet in facets[name]]
+
+    assert total == 3
+    # venues without genres are counted everywhere but under genre
+    assert counts("genre") == [("Jazz", 2), ("Blues", 1)]
+    assert counts("state") == [("CA", 3)]
+    assert counts("city") == [("Facetville", 3)]
+    assert counts("seeking") == [("No", 2), ("Yes", 1)]
+
+    total, facets = browse.facet_counts(Venue, {"city": "Facetville", "genre": ["Blues"]})
+    assert total == 1 and counts("genre") == [("Blues", 1), ("Jazz", 1)]
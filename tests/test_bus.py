@@ -0,0 +1,43 @@
+from fyyur import bus as bus_module
+from fyyur.bus import LocalBus, PostgresBus, decode_tags, encode_tags
+from fyyur.cache import PageCache
+
+
+def test_tags_round_trip():
+    tags = [("shows",), ("show_venue", 3), ("venue_availability", 42)]
+    words = encode_tags(tags)
+    assert words == ["shows", "show_venue:3", "venue_availability:42"]
+    assert decode_tags(words) == tags
+
+
+def test_local_bus_invalidates_the_cache():
+    pages = PageCache(max_bytes=1024, ttl=60)
+    bus = LocalBus()
+    bus.subscribe(pages.invalidate, pages.clear)
+    pages.set((("show_venue", 3), b""), b"venue", "text/html", pages.generation)
+    pages.set((("show_venue", 4), b""), b"other", "text/html", pages.generation)
+    bus.publish([("show_venue", 3)])
+    assert pages.get((("show_venue", 3), b"")) is None
+    assert pages.get((("show_venue", 4), b"")) == (b"other", "text/html")
+    bus._reset()
+    assert len(pages) == 0
+
+
+def test_payloads_fit_a_notify():
+    bus = PostgresBus("channel")
+    words = encode_tags(("show_venue", venue_id) for venue_id in range(2000))
+    payloads = list(bus._payloads(words))
+    assert len(payloads) > 1
+    assert all(len(payload) <= bus_module.PAYLOAD_BYTES for payload in payloads)
+    assert all(payload.split(" ")[0] == bus.origin for payload in payloads)
+    assert [word for payload in payloads for word in payload.split(" ")[1:]] == words
+
+
+def test_receive_skips_own_notifications():
+    received = []
+    bus = PostgresBus("channel")
+    bus.subscribe(received.extend, lambda: None)
+    bus._receive(f"{bus.origin} show_venue:3")
+    assert received == []
+    bus._receive("another-worker show_venue:3 shows")
+    assert received == [("show_venue", 3), ("shows",)]
@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, flash, request
+
+from fyyur import cache
+from fyyur.cache import PageCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(tag, query=b""):
+    return (tag, query)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_entries_expire_after_ttl(clock):
+    pages = PageCache(max_bytes=100, ttl=60, clock=clock)
+    pages.set(key(("venues",)), b"page", "text/html", pages.generation)
+    clock.now = 59
+    assert pages.get(key(("venues",))) == (b"page", "text/html")
+    clock.now = 60
+    assert pages.get(key(("venues",))) is None
+    assert pages.size == 0 and len(pages) == 0
+
+
+def test_least_recently_used_is_evicted_by_size(clock):
+    pages = PageCache(max_bytes=10, ttl=60, clock=clock)
+    for page_id in (1, 2):
+        pages.set(key(("show_venue", page_id)), b"xxxx", "text/html", pages.generation)
+    pages.get(key(("show_venue", 1)))
+    pages.set(key(("show_venue", 3)), b"xxxx", "text/html", pages.generation)
+    assert pages.size == 8
+    assert pages.get(key(("show_venue", 2))) is None
+    assert pages.get(key(("show_venue", 1))) is not None
+    # larger than the whole cache: not stored
+    pages.set(key(("show_venue", 4)), b"x" * 11, "text/html", pages.generation)
+    assert pages.get(key(("show_venue", 4))) is None
+
+
+def test_replacing_an_entry_keeps_the_size(clock):
+    pages = PageCache(max_bytes=100, ttl=60, clock=clock)
+    pages.set(key(("venues",)), b"12345", "text/html", pages.generation)
+    pages.set(key(("venues",)), b"123", "text/html", pages.generation)
+    assert pages.size == 3 and len(pages) == 1
+
+
+def test_invalidation_drops_every_query_string(clock):
+    pages = PageCache(max_bytes=100, ttl=60, clock=clock)
+    for query in (b"", b"cursor=abc"):
+        pages.set(key(("venues",), query), b"page", "text/html", pages.generation)
+    pages.invalidate([("venues",)])
+    assert len(pages) == 0 and pages.size == 0
+
+
+def test_page_rendered_before_an_invalidation_is_not_stored(clock):
+    pages = PageCache(max_bytes=100, ttl=60, clock=clock)
+    generation = pages.generation
+    # a write invalidates the page while it renders from older data
+    pages.invalidate([("show_venue", 3)])
+    pages.set(key(("show_venue", 3)), b"stale", "text/html", generation)
+    assert pages.get(key(("show_venue", 3))) is None
+
+
+def test_replica_page_older_than_an_invalidation_is_not_stored(clock):
+    pages = PageCache(max_bytes=100, ttl=60, replica_lag=5, clock=clock)
+    clock.now = 100
+    pages.invalidate([("show_venue", 3)])
+    clock.now = 101
+    # read from a replica up to 5 seconds behind: it may predate the write
+    pages.set(key(("show_venue", 3)), b"stale", "text/html", pages.generation, read_at=96)
+    assert pages.get(key(("show_venue", 3))) is None
+    pages.set(key(("show_venue", 3)), b"fresh", "text/html", pages.generation, read_at=100.5)
+    assert pages.get(key(("show_venue", 3))) == (b"fresh", "text/html")
+
+
+@pytest.fixture
+def view_app(monkeypatch, clock):
+    pages = PageCache(max_bytes=1024, ttl=60, clock=clock)
+    monkeypatch.setattr(cache, "pages", pages)
+    changed_at = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.renders = []
+
+    @app.route("/pages/<int:page_id>")
+    @cache.versioned_page(lambda page_id: changed_at if page_id else None)
+    @cache.cached_page
+    def page(page_id):
+        app.renders.append(page_id)
+        if request.args.get("flash"):
+            flash("Saved !")
+        return f"page {page_id}"
+
+    return app
+
+
+def test_cached_page_is_served_until_invalidated(view_app):
+    client = view_app.test_client()
+    assert client.get("/pages/1").data == b"page 1"
+    assert client.get("/pages/1").data == b"page 1"
+    assert view_app.renders == [1]
+    cache.pages.invalidate([("page", 1)])
+    client.get("/pages/1")
+    assert view_app.renders == [1, 1]
+
+
+def test_pages_with_flashes_are_not_cached(view_app):
+    client = view_app.test_client()
+    client.get("/pages/1?flash=1")
+    assert len(cache.pages) == 0
+    with client.session_transaction() as session:
+        session["_flashes"] = [("message", "Saved !")]
+    client.get("/pages/1")
+    assert len(cache.pages) == 0
+    assert view_app.renders == [1, 1]
+
+
+def test_unchanged_page_is_a_304(view_app):
+    client = view_app.test_client()
+    response = client.get("/pages/1")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert last_modified == "Tue, 01 Jan 2030 12:00:00 GMT"
+    assert client.get("/pages/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/pages/1", headers={"If-Modified-Since": last_modified}).status_code == 304
+    # answered before the page cache is even consulted
+    assert view_app.renders == [1]
+    assert cache.pages.hits == 0
+
+
+def test_unversioned_page_renders(view_app):
+    client = view_app.test_client()
+    response = client.get("/pages/0")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
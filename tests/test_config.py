@@ -0,0 +1,39 @@
+import importlib.util
+import os
+
+import pytest
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.py")
+
+
+def load_config(monkeypatch, **environ):
+    for name in ("FLASK_ENV", "SECRET_KEY", "DEBUG", "FLASK_RUN_FROM_CLI"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location("config_under_test", CONFIG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_unset_profile_is_production(monkeypatch):
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        load_config(monkeypatch)
+    config = load_config(monkeypatch, SECRET_KEY="s3cret")
+    assert config.PRODUCTION
+    assert not config.DEBUG
+
+
+def test_development_key_is_random(monkeypatch):
+    first = load_config(monkeypatch, FLASK_ENV="development")
+    second = load_config(monkeypatch, FLASK_ENV="development")
+    assert first.DEBUG
+    assert len(first.SECRET_KEY) >= 32
+    assert first.SECRET_KEY != second.SECRET_KEY
+
+
+def test_flask_commands_need_no_key(monkeypatch):
+    config = load_config(monkeypatch, FLASK_RUN_FROM_CLI="true")
+    assert config.PRODUCTION
+    assert config.SECRET_KEY
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from fyyur import counters
+from fyyur.models import Artist, Show, Venue
+
+# before any show of a database in use, so that roll-overs only see ours
+NOW = datetime(1990, 6, 1, 20, 0)
+
+
+@pytest.fixture
+def venue(session):
+    venue = Venue(
+        name="Counted Venue", city="San Francisco", state="CA",
+        address="1 Test St", phone="123-123-1234", genres=["Jazz"],
+    )
+    session.add(venue)
+    session.flush()
+    return venue
+
+
+@pytest.fixture
+def artist(session):
+    artist = Artist(
+        name="Counted Artist", city="San Francisco", state="CA",
+        phone="123-123-1234", genres=["Jazz"],
+    )
+    session.add(artist)
+    session.flush()
+    return artist
+
+
+def add_shows(session, venue, artist, *start_times):
+    shows = [
+        Show(
+            venue_id=venue.id, artist_id=artist.id, start_time=start_time,
+            counted_upcoming=counters.counted_upcoming(start_time, NOW),
+        )
+        for start_time in start_times
+    ]
+    session.add_all(shows)
+    session.flush()
+    counters.shows_added(shows)
+    return shows
+
+
+def counts(session, *entities):
+    session.expire_all()
+    return [(e.upcoming_shows_count, e.past_shows_count) for e in entities]
+
+
+def test_added_and_removed_shows_are_counted(session, venue, artist):
+    shows = add_shows(
+        session, venue, artist, NOW - timedelta(days=1), NOW + timedelta(days=1), NOW + timedelta(days=2)
+    )
+    assert counts(session, venue, artist) == [(2, 1), (2, 1)]
+    counters.shows_removed(shows[:2])
+    assert counts(session, venue, artist) == [(1, 0), (1, 0)]
+
+
+def test_roll_over_moves_started_shows_to_past(session, venue, artist):
+    add_shows(session, venue, artist, NOW + timedelta(hours=1), NOW + timedelta(days=1))
+    assert counters.roll_over(NOW) == 0
+    assert counters.roll_over(NOW + timedelta(hours=1)) == 1
+    assert counts(session, venue, artist) == [(1, 1), (1, 1)]
+    # already moved shows are not counted twice
+    assert counters.roll_over(NOW + timedelta(hours=2)) == 0
+    assert counts(session, venue, artist) == [(1, 1), (1, 1)]
+
+
+def test_verify_finds_and_repairs_drift(session, venue, artist):
+    add_shows(session, venue, artist, NOW + timedelta(hours=1))
+    assert venue.id not in {row.id for row in counters.verify()["venues"]}
+    venue.past_shows_count = 5
+    session.flush()
+    drifted = {row.id: row for row in counters.verify()["venues"]}
+    assert (drifted[venue.id].upcoming, drifted[venue.id].past) == (1, 0)
+    # with the clock past the show, repair also reflags it as past
+    counters.verify(repair=True, now=NOW + timedelta(hours=2))
+    assert counts(session, venue, artist) == [(0, 1), (0, 1)]
+    assert venue.id not in {row.id for row in counters.verify()["venues"]}
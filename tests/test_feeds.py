@@ -0,0 +1,42 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from fyyur.feeds import CHUNK_BYTES, LINE_OCTETS, calendar
+
+FeedShow = namedtuple("FeedShow", "id start_time end_time")
+
+
+def lines(name, events, changed_at):
+    return b"".join(calendar(name, events, changed_at)).decode().split("\r\n")
+
+
+def test_calendar():
+    show = FeedShow(7, datetime(2030, 1, 1, 20), datetime(2030, 1, 1, 22))
+    changed_at = datetime(2029, 12, 1, 12, 30, tzinfo=timezone(timedelta(hours=-8)))
+    text = lines("Café; Bar", [(show, "A, B at Café; Bar", "Café; Bar")], changed_at)
+    assert text[0] == "BEGIN:VCALENDAR"
+    assert "X-WR-CALNAME:Café\\; Bar" in text
+    assert "UID:show-7@fyyur" in text
+    # DTSTAMP is in UTC; show times stay floating
+    assert "DTSTAMP:20291201T203000Z" in text
+    assert "DTSTART:20300101T200000" in text
+    assert "DTEND:20300101T220000" in text
+    assert "SUMMARY:A\\, B at Café\\; Bar" in text
+    assert text[-2:] == ["END:VCALENDAR", ""]
+
+
+def test_long_lines_are_folded():
+    show = FeedShow(1, datetime(2030, 1, 1, 20), datetime(2030, 1, 1, 22))
+    text = lines("x", [(show, "é" * 100, "y")], datetime(2029, 1, 1, tzinfo=timezone.utc))
+    assert all(len(line.encode()) <= LINE_OCTETS for line in text)
+    summary = [line for line in text if line.startswith(("SUMMARY", " "))]
+    assert "".join(line[1:] if line.startswith(" ") else line for line in summary) == "SUMMARY:" + "é" * 100
+
+
+def test_chunks_are_measured_in_bytes():
+    show = FeedShow(1, datetime(2030, 1, 1, 20), datetime(2030, 1, 1, 22))
+    # two octets per character
+    events = [(show, "é" * 60, "é" * 60)] * 200
+    chunks = list(calendar("x", events, datetime(2029, 1, 1, tzinfo=timezone.utc)))
+    assert len(chunks) > 1
+    assert all(CHUNK_BYTES <= len(chunk) < CHUNK_BYTES + 1024 for chunk in chunks[:-1])
@@ -0,0 +1,34 @@
+from werkzeug.datastructures import MultiDict
+
+from fyyur.forms import SeriesForm
+
+
+def series_form(app, **data):
+    values = {
+        "venue_id": "1",
+        "artist_id": "1",
+        "start_time": "2030-01-01 20:00:00",
+        "frequency": "WEEKLY",
+        "interval": "1",
+    }
+    values.update(data)
+    with app.test_request_context(method="POST"):
+        form = SeriesForm(formdata=MultiDict(values), meta={"csrf": False})
+        return form, form.validate()
+
+
+def test_series_until_before_start_is_refused(app):
+    form, valid = series_form(app, until="2029-12-31 20:00:00")
+    assert not valid
+    assert form.until.errors == ["The end date should be after the first show !"]
+
+
+def test_series_until_at_start_has_one_show(app):
+    _, valid = series_form(app, until="2030-01-01 20:00:00")
+    assert valid
+
+
+def test_series_needs_count_or_until(app):
+    form, valid = series_form(app)
+    assert not valid
+    assert form.count.errors == ["Give a number of shows or an end date !"]
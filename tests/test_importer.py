@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from fyyur.importer import LOADERS, import_records, read_records
+
+
+def test_object_values_are_row_errors():
+    lines = [
+        '{"name": "A", "city": {"name": "SF"}, "state": ["CA", ["CA"]], "genres": [{"genre": "Jazz"}]}\n',
+    ]
+    report = import_records("venues", read_records(lines, "ndjson"))
+    assert report.inserted == 0
+    [(line, errors)] = report.errors
+    assert line == 1
+    assert errors["state"] == ["Not a valid choice"]
+    assert "genres" in errors
+
+
+def test_unhashable_values_are_not_memoized():
+    rule = next(rule for rule in LOADERS["venues"].rules if rule.name == "genres")
+    assert rule.check([{"genre": "Jazz"}])[1]
+    assert rule.check([["Jazz"]])[1]
+    assert [{"genre": "Jazz"}] not in rule._memo.values()
+
+
+def test_ids_out_of_range_are_row_errors():
+    lines = [
+        '{"venue_id": "2147483648", "artist_id": 1, "start_time": "2030-01-01T20:00:00"}\n',
+        '{"venue_id": 1, "artist_id": "1e3", "start_time": "2030-01-01T20:00:00"}\n',
+        '{"venue_id": "-1", "artist_id": 1, "start_time": "2030-01-01T20:00:00"}\n',
+    ]
+    report = import_records("shows", read_records(lines, "ndjson"))
+    assert report.inserted == 0
+    assert report.errors == [
+        (1, {"venue_id": ["Venue Id should be a number !"]}),
+        (2, {"artist_id": ["Artist Id should be a number !"]}),
+        (3, {"venue_id": ["Venue Id should be a number !"]}),
+    ]
+
+
+def test_largest_id_is_valid():
+    row, errors = LOADERS["shows"].validate(
+        {"venue_id": "2147483647", "artist_id": 1, "start_time": "2030-01-01T20:00:00"}
+    )
+    assert errors == {}
+    assert row["venue_id"] == "2147483647"
+
+
+def test_offsets_are_converted_to_local_time():
+    start = "2030-01-01T20:00:00+02:00"
+    row, errors = LOADERS["shows"].validate(
+        {"venue_id": 1, "artist_id": 1, "start_time": start, "end_time": "2030-01-01T22:00:00"}
+    )
+    assert errors == {}
+    assert row["start_time"].tzinfo is None
+    assert row["start_time"] == datetime.fromisoformat(start).astimezone().replace(tzinfo=None)
@@ -0,0 +1,29 @@
+import pytest
+
+DIAGNOSTICS = ["/metrics", "/diagnostics/pool"]
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", None)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("url", DIAGNOSTICS)
+def test_served_in_testing(client, url):
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize("url", DIAGNOSTICS)
+def test_hidden_in_production_without_token(app, client, monkeypatch, url):
+    monkeypatch.setattr(app, "testing", False)
+    monkeypatch.setattr(app, "debug", False)
+    assert client.get(url).status_code == 404
+
+
+@pytest.mark.parametrize("url", DIAGNOSTICS)
+def test_token_is_required_when_set(app, client, monkeypatch, url):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    assert client.get(url).status_code == 404
+    assert client.get(url, headers={"Authorization": "Bearer wrong"}).status_code == 404
+    assert client.get(url, headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,65 @@
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from werkzeug.exceptions import BadRequest
+
+from fyyur.models import Show, Venue
+from fyyur.pagination import decode_cursor, encode_cursor, keyset_query, page_url, pager
+
+
+def test_page_url_keeps_other_args(app):
+    with app.test_request_context("/venues/3?format=json&past_cursor=abc"):
+        url = urlsplit(page_url("def", "past_cursor"))
+    assert url.path == "/venues/3"
+    assert parse_qs(url.query) == {"format": ["json"], "past_cursor": ["def"]}
+
+
+def test_view_args_win_over_query_args(app):
+    with app.test_request_context("/venues/3?venue_id=9&past_cursor=abc"):
+        links = pager("def", "past_cursor")
+    assert urlsplit(links["next_url"]).path == "/venues/3"
+    assert urlsplit(links["first_url"]).path == "/venues/3"
+    assert parse_qs(urlsplit(links["next_url"]).query)["past_cursor"] == ["def"]
+
+
+def compiled(query):
+    return str(query.statement.compile(dialect=postgresql.dialect())).replace("\n", "")
+
+
+def test_cursor_round_trip_keeps_types():
+    keys = [Show.start_time, Show.id]
+    cursor = encode_cursor([datetime(2030, 1, 1, 20, 30), 42])
+    assert decode_cursor(cursor, keys) == [datetime(2030, 1, 1, 20, 30), 42]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["not a cursor", encode_cursor(["Blue Moon"]), encode_cursor(["Blue Moon", "42"])],
+)
+def test_bad_cursor_is_a_400(app, cursor):
+    with app.test_request_context(), pytest.raises(BadRequest):
+        decode_cursor(cursor, [Venue.name, Venue.id])
+
+
+def test_first_page_is_ordered_and_limited(app):
+    with app.app_context():
+        sql = compiled(keyset_query(Venue.query.order_by(Venue.city), [Venue.name, Venue.id], per_page=10))
+    assert "WHERE" not in sql
+    assert sql.endswith("ORDER BY venues.name, venues.id  LIMIT %(param_1)s")
+
+
+@pytest.mark.parametrize("descending, op, order", [
+    (False, ">", "venues.name, venues.id"),
+    (True, "<", "venues.name DESC, venues.id DESC"),
+])
+def test_later_pages_seek_past_the_cursor(app, descending, op, order):
+    keys = [Venue.name, Venue.id]
+    with app.test_request_context():
+        query = keyset_query(Venue.query, keys, encode_cursor(["Blue Moon", 42]), 10, descending)
+        sql = compiled(query)
+        params = query.statement.compile().params
+    assert f"WHERE (venues.name, venues.id) {op} (%(param_1)s, %(param_2)s)" in sql
+    assert f"ORDER BY {order}" in sql
+    assert params == {"param_1": "Blue Moon", "param_2": 42, "param_3": 11}
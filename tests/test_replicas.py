@@ -0,0 +1,86 @@
+import shutil
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from fyyur import replicas
+from fyyur.replicas import ReplicaPool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """SQLite stand-ins for replica_0 and replica_1, each in its own directory."""
+    engines = {}
+    for index in range(2):
+        directory = tmp_path / f"replica_{index}"
+        directory.mkdir()
+        engines[f"replica_{index}"] = create_engine(f"sqlite:///{directory}/fyyur.db")
+    return engines
+
+
+def take_down(engines, bind):
+    """New connections to `bind` fail, as to an unreachable host."""
+    shutil.rmtree(engines[bind].url.database.rsplit("/", 1)[0])
+
+
+def make_pool(engines, clock, max_lag=5):
+    return ReplicaPool(sorted(engines), engines.__getitem__, max_lag, 5, clock)
+
+
+def test_reads_go_round_robin(engines, clock):
+    pool = make_pool(engines, clock)
+    assert [pool.choose() for _ in range(4)] == ["replica_0", "replica_1"] * 2
+
+
+def test_unreachable_replica_is_skipped(engines, clock):
+    take_down(engines, "replica_0")
+    pool = make_pool(engines, clock)
+    assert [pool.choose() for _ in range(3)] == ["replica_1"] * 3
+
+
+def test_primary_serves_reads_without_a_healthy_replica(engines, clock):
+    for bind in engines:
+        take_down(engines, bind)
+    assert make_pool(engines, clock).choose() is None
+
+
+def test_lagging_replica_is_skipped(engines, clock, monkeypatch):
+    monkeypatch.setattr(replicas, "LAG_QUERY", text("SELECT 12.5"))
+    monkeypatch.setattr(engines["replica_0"].dialect, "name", "postgresql")
+    pool = make_pool(engines, clock)
+    assert [pool.choose() for _ in range(2)] == ["replica_1"] * 2
+    assert pool.replicas[0].lag == 12.5
+
+
+def test_failed_replica_returns_after_its_next_check(engines, clock):
+    pool = make_pool(engines, clock)
+    pool.choose()
+    pool.failed("replica_0")
+    clock.now = 4
+    assert [pool.choose() for _ in range(2)] == ["replica_1"] * 2
+    clock.now = 5
+    assert pool.choose() == "replica_0"
+
+
+def test_connection_failure_takes_replica_out_of_rotation(engines, clock):
+    pool = make_pool(engines, clock)
+    assert pool.choose() == "replica_0"
+    take_down(engines, "replica_0")
+    with pytest.raises(OperationalError):
+        pool.engine("replica_0").connect()
+    assert not pool.replicas[0].healthy
+    assert [pool.choose() for _ in range(2)] == ["replica_1"] * 2
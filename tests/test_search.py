@@ -0,0 +1,37 @@
+from sqlalchemy.dialects import postgresql
+
+from fyyur import search
+from fyyur.models import Venue
+
+
+def test_prefix_tsquery():
+    assert search._prefix_tsquery("Blue  Moon!") == "blue:* & moon:*"
+    assert search._prefix_tsquery("--") == ""
+
+
+def test_like_wildcards_are_escaped():
+    assert search._escape_like(r"100%_a\b") == r"100\%\_a\\b"
+
+
+def test_short_terms_are_not_searched(app):
+    # answered without a query, so no database is needed
+    with app.app_context():
+        assert search.search_venues("") == ([], 0)
+        assert search.search_artists(" ab ") == ([], 0)
+        assert search.search_all("a") == ([], 0)
+
+
+def test_pages_stop_at_the_cap(app):
+    with app.app_context():
+        assert search.search_venues("jazz", page=search.MAX_SEARCH_PAGES + 1) == ([], 0)
+    assert search.page_count(0) == 0
+    assert search.page_count(search.SEARCH_PAGE_SIZE + 1) == 2
+    assert search.page_count(10 ** 6) == search.MAX_SEARCH_PAGES
+
+
+def test_search_query_matches_name_and_document(app):
+    with app.app_context():
+        statement = search._search_query(Venue, "venue", "blue moon").statement
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "venues.name ILIKE" in sql
+    assert "fyyur_search_document(venues.name, venues.city, venues.state, venues.genres) @@" in sql
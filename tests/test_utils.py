@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from fyyur.utils import datetime_arg
+
+
+def test_datetime_arg_is_naive_local_time(app):
+    with app.test_request_context("/venues/1/availability?from=2030-01-01T00:00Z&to=2030-01-10"):
+        start, end = datetime_arg("from"), datetime_arg("to")
+    assert start == datetime(2030, 1, 1, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert end == datetime(2030, 1, 10)
+    # comparable, as the availability window compares them
+    assert start < end
+
+
+def test_datetime_arg_rejects_garbage(app):
+    with app.test_request_context("/shows?from=soon"):
+        with pytest.raises(BadRequest):
+            datetime_arg("from")
+        assert datetime_arg("to") is None